@@ -0,0 +1,50 @@
+import argparse
+import json
+import threading
+
+from src.loadtest.chat_server import start_chat_server
+from src.loadtest.load_generator import LoadGenerator
+from src.utils import load_bot_config
+
+if __name__ == '__main__':
+    # Benchmark the bot offline: start a local stand-in for the chat server,
+    # point the bot at it and replay question scripts in many rooms at once
+    parser = argparse.ArgumentParser(description="Load-test the bot against a local chat server.")
+    parser.add_argument('--rooms', type=int, default=10, help="number of concurrent chat rooms")
+    parser.add_argument('--rate', type=float, default=2.0, help="questions per second over all rooms")
+    parser.add_argument('--rounds', type=int, default=1, help="how often each room replays the script")
+    parser.add_argument('--questions', type=str, default=None, help="file with one question per line")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for a reply")
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--no-bot', action='store_true', help="only serve the API; run the bot separately")
+    args = parser.parse_args()
+
+    server, state = start_chat_server(port=args.port)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    if not args.no_bot:
+        from src.agent import MyBot
+        from src.async_listener import AsyncListener
+        mybot = MyBot('load-test-bot', 'load-test', url)
+        mybot.setup()
+        listener_config = load_bot_config()['listener']
+        if listener_config['mode'] == 'async':
+            listen = AsyncListener(mybot, listener_config['max_concurrency'], listener_config['http_pool_size']).run
+        else:
+            listen = mybot.listen
+        threading.Thread(target=listen, daemon=True).start()
+    else:
+        input(f"--- Start the bot against {url} and press Enter to begin ---")
+
+    questions = None
+    if args.questions is not None:
+        with open(args.questions, 'r') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    load_generator = LoadGenerator(state, args.rooms, questions, args.rate, args.rounds, args.timeout)
+    report = load_generator.run()
+    if not args.no_bot and mybot.engine is not None:
+        report['intent_batching'] = mybot.engine.intent_classifier.stats()
+        report['recognizers'] = mybot.engine.entity_recognition.cascade.stats()
+        report['answer_cache'] = mybot.engine.cache_stats()
+    print(json.dumps(report, indent=4))
@@ -8,64 +8,95 @@ from src.preprocessing.prepare_data import (
     download_crowd_data,
     find_movie_predicates,
     generate_label_mappings,
+    generate_entity_dicts,
+    generate_relation_ranges,
     generate_special_movies
 )
-from src.utils import load_credentials, load_training_config
+from src.utils import load_credentials, load_training_config, load_bot_config, load_data_config, load_graph
+from src.indexing.type_index import load_type_index
 from src.global_variables import film_entities
 from src.training.train import train_model
 from src.agent import MyBot
+from src.async_listener import AsyncListener
 
-# First check if the data directory exists
-# If not, create the data directory and load the data
-# If yes, check that all the necessary files are present
-print("--- Checking data directory ---")
-if not os.path.exists('data'):
-    print(f"--- Data not found. Building the data... ---")
-    os.makedirs('data')
-    prepare_data()
-else:
-    # Verify data loading
-    # Check for the graph file
-    if not os.path.exists('data/ddis/14_graph.nt'):
-        print(f"--- Graph file not found. Building the data... ---")
-        download_graph()
-    # Check for the embeddings file
-    if not os.path.exists('data/ddis/embeddings/'):
-        print(f"--- Embeddings file not found. Building the data... ---")
-        download_embeddings()
-    # Check for the image data file
-    if not os.path.exists('data/ddis/images.json'):
-        print(f"--- Image data file not found. Building the data... ---")
-        download_image_data()
-    # Check for the crowd data file
-    if not os.path.exists('data/ddis/crowd_data.tsv'):
-        print(f"--- Crowd data file not found. Building the data... ---")
-        download_crowd_data()
-    # Check for the predicates dictionary
-    if not os.path.exists('data/processed/predicate_dict.pkl'):
-        print(f"--- Movie predicates dictionary not found. Building the data... ---")
-        find_movie_predicates(film_entities)
-    # Check for the label mappings
-    if not os.path.exists('data/processed/ent2lbl.pkl') or not os.path.exists('data/processed/lbl2ent.pkl'):
-        print(f"--- Label mappings not found. Building the data... ---")
-        generate_label_mappings()
-    # Check for the special movies
-    if not os.path.exists('data/processed/special_movies.pkl'):
-        print(f"--- Special movies not found. Building the data... ---")
-        generate_special_movies(film_entities)
-print("--- Data directory check complete ---")
+# The answer workers are spawned processes that re-import this script
+if __name__ == '__main__':
+    # First check if the data directory exists
+    # If not, create the data directory and load the data
+    # If yes, check that all the necessary files are present
+    print("--- Checking data directory ---")
+    if not os.path.exists('data'):
+        print(f"--- Data not found. Building the data... ---")
+        os.makedirs('data')
+        prepare_data()
+    else:
+        # Verify data loading
+        # Check for the graph file
+        if not os.path.exists('data/ddis/14_graph.nt'):
+            print(f"--- Graph file not found. Building the data... ---")
+            download_graph()
+        # Check for the embeddings file
+        if not os.path.exists('data/ddis/embeddings/'):
+            print(f"--- Embeddings file not found. Building the data... ---")
+            download_embeddings()
+        # Check for the image data file
+        if not os.path.exists('data/ddis/images.json'):
+            print(f"--- Image data file not found. Building the data... ---")
+            download_image_data()
+        # Check for the crowd data file
+        if not os.path.exists('data/ddis/crowd_data.tsv'):
+            print(f"--- Crowd data file not found. Building the data... ---")
+            download_crowd_data()
+        # Check the files built from the graph; the graph is parsed at most once for all of them
+        data_config = load_data_config()
+        graph_path = data_config['paths']['graph']
+        paths_processed = data_config['paths_processed']
+        missing_predicates = not os.path.exists('data/processed/predicate_dict.pkl')
+        missing_labels = not os.path.exists('data/processed/ent2lbl.pkl') or not os.path.exists('data/processed/lbl2ent.pkl')
+        missing_ranges = not os.path.exists(paths_processed['relation_ranges'])
+        missing_dicts = not os.path.exists(paths_processed['all_movies_dict']) or not os.path.exists(paths_processed['all_people_dict'])
+        if missing_predicates or missing_labels or missing_ranges or missing_dicts:
+            graph = load_graph(graph_path)
+            # Check for the predicates dictionary
+            if missing_predicates:
+                print(f"--- Movie predicates dictionary not found. Building the data... ---")
+                find_movie_predicates(film_entities, graph)
+            # Check for the label mappings
+            if missing_labels:
+                print(f"--- Label mappings not found. Building the data... ---")
+                generate_label_mappings(graph)
+            # Check for the relation ranges and the movie and people dictionaries, both built with the entity type index
+            if missing_ranges or missing_dicts:
+                type_index = load_type_index(paths_processed['entity_types'], graph_path, graph)
+            if missing_ranges:
+                print(f"--- Relation ranges not found. Building the data... ---")
+                generate_relation_ranges(graph, type_index)
+            if missing_dicts:
+                print(f"--- Movie and people dictionaries not found. Building the data... ---")
+                generate_entity_dicts(graph, type_index)
+                # the special movies are taken from the movie dictionary
+                generate_special_movies()
+        # Check for the special movies
+        if not os.path.exists(paths_processed['special_movies']):
+            print(f"--- Special movies not found. Building the data... ---")
+            generate_special_movies()
+    print("--- Data directory check complete ---")
 
-# Then, check if the classifier model exists
-# If not, train the model and save it
-model_path = load_training_config()['model_path']
-if not os.path.exists(model_path):
-    print(f"--- Classifier model not found. Training the model... ---")
-    train_model()
-else:
-    print(f"--- Classifier model found. ---")
+    # Then, check if the classifier model exists
+    # If not, train the model and save it
+    model_path = load_training_config()['model_path']
+    if not os.path.exists(model_path):
+        print(f"--- Classifier model not found. Training the model... ---")
+        train_model()
+    else:
+        print(f"--- Classifier model found. ---")
 
-# Initialize the bot
-username, password, url = load_credentials()
-mybot = MyBot(username, password, url)
-mybot.setup()
-mybot.listen()
+    # Initialize the bot
+    username, password, url = load_credentials()
+    mybot = MyBot(username, password, url)
+    mybot.setup()
+    listener_config = load_bot_config()['listener']
+    if listener_config['mode'] == 'async':
+        AsyncListener(mybot, listener_config['max_concurrency'], listener_config['http_pool_size']).run()
+    else:
+        mybot.listen()
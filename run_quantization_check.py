@@ -0,0 +1,150 @@
+import sys
+import argparse
+import json
+import time
+import resource
+import torch
+import multiprocessing as mp
+import numpy as np
+
+from src.utils import load_graph, load_resources, load_data_config, load_bot_config
+from src.nlp_utils import EntityRecognition, setup_answer_classifier_model, strip_question_mark
+from src.indexing.triple_store import as_graph_store
+from src.indexing.description_table import DescriptionTable
+from src.inference import configure_threads, quantize_model, quantize_ner, model_size_mb
+
+def ner_entities(ner, sentence):
+    return sorted((entity['word'], entity['entity_group']) for entity in ner(sentence, aggregation_strategy="simple"))
+
+def time_ner(ner, sentences, repeat):
+    start_time = time.time()
+    for _ in range(repeat):
+        outputs = [ner_entities(ner, sentence) for sentence in sentences]
+    return outputs, (time.time() - start_time) / (repeat * len(sentences))
+
+def time_classifier(model, X, tags, repeat):
+    start_time = time.time()
+    with torch.inference_mode():
+        for _ in range(repeat):
+            outputs = [tags[torch.argmax(model(x.reshape(1, -1))).item()] for x in X]
+    return outputs, (time.time() - start_time) / (repeat * len(X))
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def rss_mb():
+    # current resident set size, only available on Linux
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        return None
+
+def measure_memory(quantize, num_threads, questions, X, result_queue):
+    """Load the NER pipeline and the classifier as the bot does and answer the questions, in a fresh process per mode."""
+    configure_threads(num_threads)
+    baseline = rss_mb()
+    _, ner = load_resources(quantize=quantize)
+    model, _, _, tags = setup_answer_classifier_model(quantize=quantize)
+    model = model.to('cpu')
+    loaded = rss_mb()
+    time_ner(ner, questions, 1)
+    time_classifier(model, torch.from_numpy(X), tags, 1)
+    after = rss_mb()
+    result_queue.put({
+        'rss_loaded_mb': loaded - baseline if baseline is not None else None,
+        'rss_after_inference_mb': after - baseline if baseline is not None else None,
+        'peak_rss_mb': peak_rss_mb()
+    })
+
+def memory_of(quantize, num_threads, questions, X):
+    # a separate process, so that the models of the other mode (and of this script) are not counted
+    context = mp.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=measure_memory, args=(quantize, num_threads, questions, X, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+def reduction(before, after):
+    return 1 - after / before if before else 0.0
+
+if __name__ == '__main__':
+    # Compare the int8 (quantized) inference mode with the fp32 models on held-out
+    # questions: do the NER entities and intent tags agree, how much faster are the
+    # quantized models on this machine, how much smaller are their serialized
+    # state dicts and how much memory does the process use in each mode?
+    parser = argparse.ArgumentParser(description="Check the quantized NER and intent models against fp32.")
+    parser.add_argument('--questions', type=str, default='config/heldout_questions.txt', help="file with one question per line")
+    parser.add_argument('--repeat', type=int, default=3, help="timing repetitions over the question set")
+    args = parser.parse_args()
+
+    bot_config = load_bot_config()
+    configure_threads(bot_config['inference']['num_threads'])
+    with open(args.questions, 'r') as f:
+        questions = [strip_question_mark(line.strip()) for line in f if line.strip()]
+
+    nlp, ner = load_resources(quantize=False)
+    ner_int8 = quantize_ner(ner)
+    model, _, vectorizer, tags = setup_answer_classifier_model(quantize=False)
+    model = model.to('cpu')
+    model_int8 = quantize_model(model)
+
+    # the classifier features are built exactly as the bot builds them: entity
+    # recognition (which drops the entity tokens) and then vectorizer.transform
+    kg_graph = as_graph_store(load_graph(load_data_config()['paths_processed']['updated_graph'], backend=bot_config['graph_backend']))
+    entity_recognition = EntityRecognition(kg_graph, nlp, ner, DescriptionTable.empty())
+    word_lists = [word_list for _, word_list in entity_recognition.recognize_many(questions)]
+    X = torch.from_numpy(np.stack([vectorizer.transform(word_list) for word_list in word_lists]))
+
+    entities_fp32, ner_latency_fp32 = time_ner(ner, questions, args.repeat)
+    entities_int8, ner_latency_int8 = time_ner(ner_int8, questions, args.repeat)
+    tags_fp32, tag_latency_fp32 = time_classifier(model, X, tags, args.repeat)
+    tags_int8, tag_latency_int8 = time_classifier(model_int8, X, tags, args.repeat)
+
+    ner_size_fp32, ner_size_int8 = model_size_mb(ner.model), model_size_mb(ner_int8.model)
+    tag_size_fp32, tag_size_int8 = model_size_mb(model), model_size_mb(model_int8)
+    memory_fp32 = memory_of(False, bot_config['inference']['num_threads'], questions, X.numpy())
+    memory_int8 = memory_of(True, bot_config['inference']['num_threads'], questions, X.numpy())
+    report = {
+        'questions': len(questions),
+        'threads': torch.get_num_threads(),
+        'ner': {
+            'agreement': sum(a == b for a, b in zip(entities_fp32, entities_int8)) / len(questions),
+            'latency_fp32_ms': ner_latency_fp32 * 1000,
+            'latency_int8_ms': ner_latency_int8 * 1000,
+            'latency_reduction': reduction(ner_latency_fp32, ner_latency_int8),
+            'state_dict_fp32_mb': ner_size_fp32,
+            'state_dict_int8_mb': ner_size_int8,
+            'state_dict_reduction': reduction(ner_size_fp32, ner_size_int8)
+        },
+        'intent_classifier': {
+            'agreement': sum(a == b for a, b in zip(tags_fp32, tags_int8)) / len(questions),
+            'latency_fp32_ms': tag_latency_fp32 * 1000,
+            'latency_int8_ms': tag_latency_int8 * 1000,
+            'latency_reduction': reduction(tag_latency_fp32, tag_latency_int8),
+            'state_dict_fp32_mb': tag_size_fp32,
+            'state_dict_int8_mb': tag_size_int8,
+            'state_dict_reduction': reduction(tag_size_fp32, tag_size_int8)
+        },
+        # resident memory of a process that loads both models and answers the questions:
+        # rss_* is measured relative to the freshly started process, peak_rss is its maximum
+        'memory': {
+            'fp32': memory_fp32,
+            'int8': memory_int8,
+            'rss_reduction': reduction(memory_fp32['rss_after_inference_mb'], memory_int8['rss_after_inference_mb'])
+                if memory_fp32['rss_after_inference_mb'] is not None else None,
+            'peak_rss_reduction': reduction(memory_fp32['peak_rss_mb'], memory_int8['peak_rss_mb'])
+        },
+        'disagreements': [
+            {'question': question, 'entities_fp32': a, 'entities_int8': b, 'tag_fp32': c, 'tag_int8': d}
+            for question, a, b, c, d in zip(questions, entities_fp32, entities_int8, tags_fp32, tags_int8)
+            if a != b or c != d
+        ]
+    }
+    print(json.dumps(report, indent=4))
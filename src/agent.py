@@ -1,16 +1,11 @@
 import time
 import atexit
+import threading
 import requests
-import random
-import json
-import torch
 from collections import defaultdict
-from src.nlp_utils import EntityRecognition, setup_answer_classifier_model
-from src.question_handling.factual_questions import Query_Response
-from src.question_handling.multimedia_questions import Multimedia_Response
-from src.question_handling.recommendation_questions import Rec_Response
-from src.utils import load_graph, load_json, load_resources, load_data_config
-from src.training.train import bag_of_words
+from src.utils import load_bot_config
+from src.room_polling import RoomSchedule
+from src.worker_pool import AnswerWorkerPool, fallback_response
 
 listen_freq = 2
 
@@ -25,32 +20,52 @@ class MyBot:
         atexit.register(self.logout)
 
     def setup(self):
-        self.data_config = load_data_config()
-        print(f"- Loading all necessary data for bot {self.username}...")
-        self.kg_graph = load_graph(self.data_config['paths_processed']['updated_graph'])
-        self.image_data = load_json(self.data_config['paths']['images'])
-        print(f"- Setting up the answer classifier model for bot {self.username}...")
-        self.model, self.device, self.vocabulary, self.tags = setup_answer_classifier_model()
-        print(f"-  Setting up all relevant NLP resources for bot {self.username}...")
-        self.nlp, self.ner = load_resources()
+        self.bot_config = load_bot_config()
+        self.room_schedule = RoomSchedule(**self.bot_config['polling'])
+        self.engine_lock = threading.Lock()
+        workers_config = self.bot_config['workers']
+        if workers_config['count'] > 0:
+            print(f"- Starting {workers_config['count']} answer workers for bot {self.username}...")
+            self.engine = None
+            self.worker_pool = AnswerWorkerPool(
+                workers_config['count'], self.post_reply, workers_config['max_retries'],
+                max_restarts=workers_config['max_restarts'], restart_backoff=workers_config['restart_backoff'],
+                on_failure=self.answer_in_process
+            )
+        else:
+            # imported here so that the listener does not load the models when the workers answer
+            from src.answer_engine import AnswerEngine
+            self.worker_pool = None
+            self.engine = AnswerEngine(self.username)
+            self.engine.setup()
+            self.watch_data()
 
     def listen(self):
         print(f"- Bot {self.username} is now listening for new messages...")
+        current_rooms = list()
+        next_rooms_check = 0
         while True:
-            # check for all chatrooms
-            current_rooms = self.check_rooms()['rooms']
+            # check for all chatrooms (one call for all of them), every listen_freq seconds
+            if time.time() >= next_rooms_check:
+                current_rooms = self.check_rooms()['rooms']
+                next_rooms_check = time.time() + listen_freq
             for room in current_rooms:
+                room_id = room['uid']
                 # ignore finished conversations
-                if room['remainingTime'] > 0:
-                    room_id = room['uid']
-                    if not self.chat_state[room_id]['initiated']:  # check whether the chatroom has been initiated (default: False)
-                        # send a welcome message and get the alias of the agent in the chatroom
-                        self.post_message(room_id=room_id, message='Welcome! I\'m here to answer all your movie-related questions.')
-                        self.chat_state[room_id]['initiated'] = True
-                        self.chat_state[room_id]['my_alias'] = room['alias']
-
-                    # check for all messages
-                    all_messages = self.check_room_state(room_id=room_id, since=0)['messages']
+                if room['remainingTime'] <= 0:
+                    self.room_schedule.remove(room_id)
+                    continue
+                if not self.chat_state[room_id]['initiated']:  # check whether the chatroom has been initiated (default: False)
+                    # send a welcome message and get the alias of the agent in the chatroom
+                    self.post_message(room_id=room_id, message='Welcome! I\'m here to answer all your movie-related questions.')
+                    self.chat_state[room_id]['initiated'] = True
+                    self.chat_state[room_id]['my_alias'] = room['alias']
+
+                # quiet rooms are polled less and less often
+                if self.room_schedule.is_due(room_id, time.time()):
+                    # check for the messages since the last one we have seen
+                    all_messages = self.check_room_state(room_id=room_id, since=self.room_schedule.since(room_id))['messages']
+                    self.room_schedule.update(room_id, all_messages, time.time())
 
                     for message in all_messages:
                         if message['authorAlias'] != self.chat_state[room_id]['my_alias']:  # make sure that you're not echoing your own message
@@ -59,10 +74,14 @@ class MyBot:
                             if message['ordinal'] not in self.chat_state[room_id]['messages']:  # check if the message has been previously "logged" to the chatroom
                                 self.chat_state[room_id]['messages'][message['ordinal']] = message  # "log" the message to the chatrooms history
                                 print('\t- Chatroom {} - new message #{}: \'{}\' - {}'.format(room_id, message['ordinal'], message['message'], self.get_time()))
-                                response = self.get_response(message['message'])
-                                self.post_message(room_id=room_id, message=response)
-                        
-            time.sleep(listen_freq)
+                                if self.worker_pool is not None:
+                                    # the reply is posted by post_reply once a worker has answered
+                                    self.worker_pool.submit(room_id, message['ordinal'], message['message'])
+                                else:
+                                    response = self.get_response(message['message'])
+                                    self.post_message(room_id=room_id, message=response)
+
+            time.sleep(self.room_schedule.sleep_time(time.time()))
 
     def login(self):
         agent_details = requests.post(url=self.url + "/api/login", json={"username": self.username, "password": self.password}).json()
@@ -81,6 +100,35 @@ class MyBot:
         if tmp_des['description'] != 'Message received':
             print('\t\t Error: failed to post message: {}'.format(message))
 
+    def post_reply(self, room_id: str, ordinal: int, response: str):
+        self.post_message(room_id=room_id, message=response)
+
+    def answer_in_process(self, tasks):
+        """Called by the worker pool once none of its workers could be started: answer in this process from now on."""
+        with self.engine_lock:
+            if self.engine is None:
+                from src.answer_engine import AnswerEngine
+                print(f"- Loading the models in the listener of bot {self.username} instead...")
+                engine = AnswerEngine(self.username)
+                engine.setup()
+                self.engine = engine
+                self.worker_pool = None
+                self.watch_data()
+        for room_id, ordinal, message in tasks:
+            self.post_reply(room_id, ordinal, self.get_response(message))
+
+    def watch_data(self):
+        reload_freq = self.bot_config['data']['reload_freq']
+        if reload_freq:
+            threading.Thread(target=self.reload_data, args=(reload_freq,), daemon=True).start()
+
+    def reload_data(self, reload_freq):
+        """Replace the engine by a new one once its data files change; messages are answered by the old one meanwhile."""
+        from src.answer_engine import reload_if_changed
+        while True:
+            time.sleep(reload_freq)
+            self.engine = reload_if_changed(self.engine)
+
     def get_time(self):
         return time.strftime("%H:%M:%S, %d-%m-%Y", time.localtime())
 
@@ -89,49 +137,7 @@ class MyBot:
             print('- Session \'{}\' successfully logged out!'.format(self.session_token))
 
     def get_response(self, message):
-        with open('./data/intents.json', 'r') as json_data:
-            intents = json.load(json_data)
-
-        ER = EntityRecognition(
-            message,
-            self.kg_graph,
-            self.nlp,
-            self.ner
-        )
-        linked_entities = ER.linked_entities
-        word_list = ER.word_list
-        X = bag_of_words(self.vocabulary, word_list)
-        X = X.reshape(1, X.shape[0])
-        X = torch.from_numpy(X).to(self.device)
-        
-        output = self.model(X)
-        _, predicted = torch.max(output, dim=1)
-
-        tag = self.tags[predicted.item()]
-
-        probs = torch.softmax(output, dim=1)
-        prob = probs[0][predicted.item()]
-        if prob.item() > 0.75:
-            for intent in intents['intents']: # loop through all intents (question contexts)
-                if tag == intent["tag"]:
-                    try:  # making sure that the script won't crash in case something unexpected happens
-                        print("Tag detected: {}".format(tag))
-                        if tag in ["greeting", "goodbye"]:
-                            response = random.choice(intent['responses'])
-                        elif tag == "recommendation":
-                            intent_responses = intent['responses']
-                            response_obj = Rec_Response(self.kg_graph, linked_entities, intent_responses)
-                            response = response_obj.build_response()
-                        elif tag == "multimedia":
-                            response_obj = Multimedia_Response(self.kg_graph, linked_entities, self.image_data)
-                            response = response_obj.build_response()
-                        else:
-                            intent_responses = intent['responses']
-                            response_obj = Query_Response(tag, self.kg_graph, linked_entities, intent_responses, message)
-                            response = response_obj.build_response()
-                    except:
-                        response = "Sorry, could you rephrase your message?"
-        else:
-            response = "Sorry, could you rephrase your message?"
-        print(response)
-        return response
+        if self.engine is None:
+            # the workers could not be started and neither could the engine
+            return fallback_response
+        return self.engine.get_response(message)
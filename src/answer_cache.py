@@ -0,0 +1,76 @@
+import time
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+def normalize_message(message):
+    """Cache key of a message: whitespace collapsed, trailing punctuation dropped.
+
+    Case is kept, because the NER models are case-sensitive.
+    """
+    return ' '.join(message.split()).rstrip('?!. ')
+
+class TTLCache():
+    """Bounded LRU cache whose entries expire `ttl` seconds after they were stored.
+
+    `invalidate` drops every entry, and values that were being computed
+    when it was called are not stored.
+    """
+    def __init__(self, max_size=4096, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return  # the cache was invalidated while it was computed
+            self.entries[key] = (value, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        generation = self.generation
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value, generation)
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self.entries),
+                'invalidations': self.generation
+            }
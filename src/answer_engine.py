@@ -0,0 +1,168 @@
+from src.nlp_utils import EntityRecognition, setup_answer_classifier_model
+from src.question_handling.factual_questions import Query_Response
+from src.question_handling.multimedia_questions import Multimedia_Response
+from src.question_handling.recommendation_questions import Rec_Response
+from src.question_handling.smalltalk_questions import Smalltalk_Response
+from src.utils import load_graph, load_resources, load_data_config, load_bot_config, load_training_config
+from src.indexing.triple_store import as_graph_store
+from src.indexing.description_table import load_description_table
+from src.indexing.image_index import load_image_index
+from src.indexing.embedding_store import get_embedding_store, reset_embedding_store
+from src.indexing.label_index import load_label_index
+from src.indexing.array_store import file_signature
+from src.intent_dispatcher import IntentDispatcher
+from src.intent_batcher import IntentMicroBatcher
+from src.inference import configure_threads
+from src.answer_cache import TTLCache, normalize_message
+
+def data_files(data_config):
+    """The files an engine is loaded from: the graph, the processed pickles, the embeddings, images.json and the classifier model."""
+    paths_processed = data_config['paths_processed']
+    paths_embeddings = data_config['paths_embeddings']
+    return [
+        paths_processed['updated_graph'], data_config['paths']['images'],
+        paths_processed['ent2lbl'], paths_processed['all_movies_dict'], paths_processed['all_people_dict'],
+        paths_processed['indirectSubclassOf_entities'], paths_processed['special_movies'],
+        paths_processed['predicate_dict'], paths_processed['crowd_predicates'], paths_processed['relation_ranges'],
+        paths_embeddings['entity_emb'], paths_embeddings['relation_emb'],
+        paths_embeddings['entity_file'], paths_embeddings['relation_file'],
+        load_training_config()['model_path']
+    ]
+
+def data_signatures(data_config):
+    signatures = dict()
+    for path in data_files(data_config):
+        try:
+            signatures[path] = file_signature(path)
+        except OSError:
+            signatures[path] = None
+    return signatures
+
+class AnswerEngine:
+    """Loads the graph, classifier and NLP models and answers single messages.
+
+    Kept apart from `MyBot` so that answering does not depend on a chat
+    session, e.g. in the worker processes of `AnswerWorkerPool`. An engine
+    loads its data once; `reload_if_changed` replaces it by a new engine,
+    with empty caches, when one of its files has changed.
+    """
+    def __init__(self, name):
+        self.name = name
+        cache_config = load_bot_config()['answer_cache']
+        self.cache_enabled = cache_config['enabled']
+        # normalized message -> (linked entities, word list, tag, accepted)
+        self.recognition_cache = TTLCache(**cache_config['recognition'])
+        # handler request, e.g. (tag, movie ID) -> answer payload, before a template is picked
+        self.answer_cache = TTLCache(**cache_config['answers'])
+
+    def setup(self):
+        self.data_config = load_data_config()
+        self.bot_config = load_bot_config()
+        print(f"- Loading all necessary data for bot {self.name}...")
+        # taken before loading, so that a file changing while it is loaded causes another reload
+        self.signatures = data_signatures(self.data_config)
+        # the label indexes and the embedding store are shared within the process: read the files
+        # again instead of reusing the ones an engine loaded before
+        load_label_index.cache_clear()
+        reset_embedding_store()
+        graph_path = self.data_config['paths_processed']['updated_graph']
+        self.kg_graph = as_graph_store(load_graph(graph_path, backend=self.bot_config['graph_backend']))
+        # entity descriptions are only printed, so they are not built, loaded or looked up unless logging is verbose
+        self.descriptions = load_description_table(self.data_config['paths_processed']['descriptions'], graph_path, self.kg_graph, self.bot_config['logging']['verbose'])
+        self.image_index = load_image_index(
+            self.data_config['paths_processed']['image_index'], self.data_config['paths_processed']['image_table'],
+            self.data_config['paths']['images'], graph_path, self.kg_graph
+        )
+        configure_threads(self.bot_config['inference']['num_threads'])
+        print(f"- Setting up the answer classifier model for bot {self.name}...")
+        self.model, self.device, self.vectorizer, self.tags = setup_answer_classifier_model()
+        batching_config = self.bot_config['intent_batching']
+        self.intent_classifier = IntentMicroBatcher(
+            self.model, self.device, self.tags,
+            batching_config['window_ms'] / 1000, batching_config['max_batch_size'], enabled=batching_config['enabled']
+        )
+        print(f"-  Setting up all relevant NLP resources for bot {self.name}...")
+        self.nlp, self.ner = load_resources()
+        print(f"- Setting up the entity recognizer for bot {self.name}...")
+        self.entity_recognition = EntityRecognition(self.kg_graph, self.nlp, self.ner, self.descriptions)
+        self.setup_dispatcher()
+
+    def is_stale(self):
+        """True if one of the files the engine was loaded from has changed since."""
+        return data_signatures(self.data_config) != self.signatures
+
+    def close(self):
+        """Stop the engine's background threads and drop its cached answers, once it has been replaced."""
+        self.dispatcher.close()
+        self.recognition_cache.invalidate()
+        self.answer_cache.invalidate()
+
+    def setup_dispatcher(self):
+        # handlers are created once and shared by all messages; the embedding
+        # store is loaded once per process and shared by the handlers using it
+        self.embeddings = get_embedding_store(self.entity_recognition.type_index)
+        smalltalk_handler = Smalltalk_Response()
+        handlers = {
+            'greeting': smalltalk_handler,
+            'goodbye': smalltalk_handler,
+            'recommendation': Rec_Response(self.kg_graph, self.descriptions, self.embeddings),
+            'multimedia': Multimedia_Response(self.kg_graph, self.image_index, self.descriptions)
+        }
+        intents_config = self.bot_config['intents']
+        self.dispatcher = IntentDispatcher(intents_config['path'], handlers, Query_Response(self.kg_graph, self.descriptions, self.embeddings), intents_config['reload_freq'])
+
+    def recognize(self, message):
+        linked_entities, word_list = self.entity_recognition.recognize(message)
+        X = self.vectorizer.transform(word_list)
+        # messages of concurrent rooms are classified in one batch
+        tag, prob, accepted = self.intent_classifier.classify(X)
+        return linked_entities, word_list, tag, accepted
+
+    def answer(self, tag, linked_entities, message):
+        handler, responses = self.dispatcher.lookup(tag)
+        request = handler.select(tag, linked_entities, message)
+        if request is None or not self.cache_enabled:
+            payload = handler.compute(request)
+        else:
+            payload = self.answer_cache.get_or_compute(request, lambda: handler.compute(request))
+        # the template is picked per message, so cached answers are still phrased differently
+        return handler.render(payload, responses)
+
+    def get_response(self, message):
+        if self.cache_enabled:
+            linked_entities, word_list, tag, accepted = self.recognition_cache.get_or_compute(normalize_message(message), lambda: self.recognize(message))
+        else:
+            linked_entities, word_list, tag, accepted = self.recognize(message)
+        response = "Sorry, could you rephrase your message?"
+        if accepted and tag in self.dispatcher:
+            try:  # making sure that the script won't crash in case something unexpected happens
+                print("Tag detected: {}".format(tag))
+                response = self.answer(tag, linked_entities, message)
+            except:
+                response = "Sorry, could you rephrase your message?"
+        print(response)
+        return response
+
+    def cache_stats(self):
+        return {
+            'recognition': self.recognition_cache.stats(),
+            'answers': self.answer_cache.stats(),
+            'link_prediction': self.embeddings.link_predictor.stats()
+        }
+
+def reload_if_changed(engine):
+    """`engine`, or a new engine loaded from the current files if they have changed since it was set up."""
+    if not engine.is_stale():
+        return engine
+    print(f"- The data of bot {engine.name} has changed; reloading it...")
+    try:
+        new_engine = AnswerEngine(engine.name)
+        new_engine.setup()
+    except Exception as e:
+        # keep answering with the loaded data and try again once the files change again
+        print(f"\t\t Error: failed to reload the data of bot {engine.name}: {e}")
+        engine.signatures = data_signatures(engine.data_config)
+        return engine
+    engine.close()
+    print(f"- Reloaded the data of bot {engine.name}.")
+    return new_engine
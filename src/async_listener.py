@@ -0,0 +1,90 @@
+import time
+import asyncio
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
+from src.agent import listen_freq
+
+class AsyncListener():
+    """asyncio version of `MyBot.listen`: each room is handled by its own task, so a slow question only delays its room."""
+    def __init__(self, bot, max_concurrency=4, http_pool_size=32):
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.http_pool_size = http_pool_size
+        self.room_tasks = dict()
+
+    def run(self):
+        asyncio.run(self.listen())
+
+    async def listen(self):
+        print(f"- Bot {self.bot.username} is now listening for new messages (async, {self.max_concurrency} workers)...")
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.http_pool_size)
+        schedule = self.bot.room_schedule
+        current_rooms = list()
+        next_rooms_check = 0
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self.session = session
+            while True:
+                loop_time = time.time()
+                # check for all chatrooms (one call for all of them), every listen_freq seconds
+                if loop_time >= next_rooms_check:
+                    try:
+                        current_rooms = (await self.check_rooms())['rooms']
+                    except Exception as e:
+                        print(f"\t\t Error: failed to check rooms: {e}")
+                    next_rooms_check = time.time() + listen_freq
+                for room in current_rooms:
+                    # ignore finished conversations
+                    if room['remainingTime'] <= 0:
+                        schedule.remove(room['uid'])
+                        continue
+                    # rooms whose previous round is still being answered are picked up once it is done
+                    task = self.room_tasks.get(room['uid'])
+                    if (task is None or task.done()) and schedule.is_due(room['uid'], loop_time):
+                        self.room_tasks[room['uid']] = asyncio.create_task(self.process_room(room))
+                await asyncio.sleep(schedule.sleep_time(time.time()))
+
+    async def process_room(self, room):
+        room_id = room['uid']
+        chat_state = self.bot.chat_state[room_id]
+        try:
+            if not chat_state['initiated']:
+                # send a welcome message and get the alias of the agent in the chatroom
+                await self.post_message(room_id=room_id, message='Welcome! I\'m here to answer all your movie-related questions.')
+                chat_state['initiated'] = True
+                chat_state['my_alias'] = room['alias']
+
+            # check for the messages since the last one we have seen
+            all_messages = (await self.check_room_state(room_id=room_id, since=self.bot.room_schedule.since(room_id)))['messages']
+            self.bot.room_schedule.update(room_id, all_messages, time.time())
+            for message in all_messages:
+                # make sure that you're not echoing your own message and that the message is new
+                if message['authorAlias'] != chat_state['my_alias'] and message['ordinal'] not in chat_state['messages']:
+                    chat_state['messages'][message['ordinal']] = message
+                    print('\t- Chatroom {} - new message #{}: \'{}\' - {}'.format(room_id, message['ordinal'], message['message'], self.bot.get_time()))
+                    if self.bot.worker_pool is not None:
+                        # the reply is posted by bot.post_reply once a worker has answered
+                        self.bot.worker_pool.submit(room_id, message['ordinal'], message['message'])
+                        continue
+                    # answered in a thread pool of max_concurrency threads, off the event loop
+                    loop = asyncio.get_running_loop()
+                    response = await loop.run_in_executor(self.executor, self.bot.get_response, message['message'])
+                    await self.post_message(room_id=room_id, message=response)
+        except Exception as e:
+            print(f"\t\t Error: failed to process chatroom {room_id}: {e}")
+
+    async def check_rooms(self):
+        async with self.session.get(self.bot.url + "/api/rooms", params={"session": self.bot.session_token}) as response:
+            return await response.json(content_type=None)
+
+    async def check_room_state(self, room_id: str, since: int):
+        async with self.session.get(self.bot.url + "/api/room/{}/{}".format(room_id, since),
+                                    params={"roomId": room_id, "since": since, "session": self.bot.session_token}) as response:
+            return await response.json(content_type=None)
+
+    async def post_message(self, room_id: str, message: str):
+        async with self.session.post(self.bot.url + "/api/room/{}".format(room_id),
+                                     params={"roomId": room_id, "session": self.bot.session_token}, data=message.encode('utf-8')) as response:
+            tmp_des = await response.json(content_type=None)
+        if tmp_des['description'] != 'Message received':
+            print('\t\t Error: failed to post message: {}'.format(message))
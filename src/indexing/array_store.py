@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_meta(directory):
+    """The meta.json of a saved store, or None if there is none (e.g. it was not completely written)."""
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_store_valid(directory, version, sources):
+    """True if the store is complete and was written by this version from the current source files."""
+    meta = read_meta(directory)
+    try:
+        return meta['version'] == version and meta['sources'] == [file_signature(path) for path in sources]
+    except (OSError, TypeError, KeyError):
+        return False
+
+def save_arrays(directory, arrays, version, sources, **info):
+    """Write a dictionary of NumPy arrays as .npy files, plus a meta.json.
+
+    The arrays go into a new `data-*` subdirectory, and `meta.json`, which
+    names it and records the size and mtime of every source file, is swapped
+    in last with `os.replace`. Files another process may have memory-mapped
+    are never written to, so readers see either the old store or the new one,
+    also while several processes rebuild it at once.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = f"data-{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(os.path.join(directory, data))
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, data, name + '.npy'), array)
+    meta = dict(info, version=version, sources=[file_signature(path) for path in sources], data=data, arrays=list(arrays))
+    replaced = read_meta(directory)
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+    if replaced is not None:
+        remove_data(directory, replaced)
+
+def remove_data(directory, meta):
+    """Delete the arrays of a replaced store (readers that mapped them keep their copy)."""
+    if meta.get('data'):
+        shutil.rmtree(os.path.join(directory, meta['data']), ignore_errors=True)
+        return
+    # stores written before the data subdirectories kept the arrays next to meta.json
+    for name in os.listdir(directory):
+        if name.endswith('.npy'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def load_arrays(directory, names, mmap=True):
+    """The meta.json of a store and its named arrays, memory-mapped by default; missing arrays are None."""
+    mmap_mode = 'r' if mmap else None
+    for attempt in range(2):
+        meta = read_meta(directory)
+        data_directory = os.path.join(directory, meta.get('data') or '')
+        try:
+            arrays = dict()
+            for name in names:
+                path = os.path.join(data_directory, name + '.npy')
+                saved = name in meta['arrays'] if 'arrays' in meta else os.path.exists(path)
+                arrays[name] = np.load(path, mmap_mode=mmap_mode) if saved else None
+            return meta, arrays
+        except FileNotFoundError:
+            # replaced (and removed) by another process in the meantime: read the new meta.json
+            if attempt == 1:
+                raise
+
+def pack_strings(values):
+    """UTF-8 blob of a list of strings and the offsets of each string in it."""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+class StringTable():
+    """Strings numbered by row, without one Python object per string.
+
+    The strings are a UTF-8 blob in row order (`offsets`/`blob`), so a row is
+    read back by slicing. `get` finds the row of a string by binary search:
+    over `order`, the rows sorted by string, or over the rows themselves when
+    the table is stored sorted (no `order`). UTF-8 byte order is code point
+    order, so sorting the Python strings sorts their encodings too.
+    """
+    def __init__(self, offsets, blob, order=None):
+        self.offsets = offsets
+        self.blob = blob
+        self.order = order
+
+    @classmethod
+    def from_strings(cls, strings, searchable=True):
+        """Table of the strings in the given order; `searchable` adds the `order` that `get` needs."""
+        offsets, blob = pack_strings(strings)
+        order = None
+        if searchable:
+            order = np.array(sorted(range(len(strings)), key=strings.__getitem__), dtype=np.int64)
+        return cls(offsets, blob, order)
+
+    @classmethod
+    def from_sorted(cls, strings):
+        """Table of strings that are already sorted, searchable without `order`."""
+        return cls(*pack_strings(strings))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def string_bytes(self, row):
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes()
+
+    def __getitem__(self, row):
+        return self.string_bytes(row).decode('utf-8')
+
+    def row_at(self, position):
+        return int(self.order[position]) if self.order is not None else position
+
+    def get(self, value, default=None):
+        """Row of a string, or `default` if the table does not have it."""
+        target = value.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.string_bytes(self.row_at(mid)) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.string_bytes(self.row_at(lo)) == target:
+            return self.row_at(lo)
+        return default
+
+    def index(self, value):
+        row = self.get(value)
+        if row is None:
+            raise KeyError(value)
+        return row
+
+    def __contains__(self, value):
+        return self.get(value) is not None
+
+    def arrays(self, name):
+        """The table's arrays, named for `save_arrays`."""
+        arrays = {name + '_offsets': self.offsets, name + '_blob': self.blob}
+        if self.order is not None:
+            arrays[name + '_order'] = self.order
+        return arrays
+
+    @staticmethod
+    def array_names(name):
+        return (name + '_offsets', name + '_blob', name + '_order')
+
+    @classmethod
+    def from_arrays(cls, arrays, name):
+        return cls(arrays[name + '_offsets'], arrays[name + '_blob'], arrays.get(name + '_order'))
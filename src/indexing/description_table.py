@@ -0,0 +1,94 @@
+import numpy as np
+from src.global_variables import SCHEMA
+from src.indexing.type_index import wd_id
+from src.indexing.array_store import StringTable, is_store_valid, save_arrays, load_arrays
+
+TABLE_VERSION = 2
+SEPARATOR = '\x1f'
+
+def entity_number(entity):
+    """'Q42' -> 42; None for anything that is not a Wikidata item ID."""
+    if entity is None or not entity.startswith('Q') or not entity[1:].isdigit():
+        return None
+    return int(entity[1:])
+
+class DescriptionTable():
+    """Descriptions of the graph's Wikidata items, precomputed from the graph.
+
+    Items are stored as a sorted array of their Q-numbers and their
+    descriptions as a `StringTable` in the same row order, so the table can
+    be memory-mapped and a lookup is one binary search. Only used for log
+    lines: with `verbose=False`, `describe` returns an empty list without
+    looking anything up.
+    """
+    def __init__(self, ids, descriptions, verbose=True):
+        self.ids = ids
+        self.descriptions = descriptions
+        self.verbose = verbose
+
+    @classmethod
+    def from_graph(cls, graph, verbose=True):
+        """Build the table from a graph store (`TripleStore` or `RdflibStore`)."""
+        descriptions = dict()
+        for s, o in graph.subject_objects(str(SCHEMA['description'])):
+            number = entity_number(wd_id(s))
+            if number is not None:
+                descriptions.setdefault(number, []).append(o)
+        numbers = sorted(descriptions)
+        return cls(
+            np.array(numbers, dtype=np.int64),
+            StringTable.from_strings([SEPARATOR.join(descriptions[n]) for n in numbers], searchable=False),
+            verbose
+        )
+
+    @classmethod
+    def empty(cls):
+        """A table without entries, for when descriptions are not logged."""
+        return cls(np.zeros(0, dtype=np.int64), StringTable.from_strings([], searchable=False), verbose=False)
+
+    def save(self, directory, source_path):
+        arrays = {'ids': self.ids}
+        arrays.update(self.descriptions.arrays('description'))
+        save_arrays(directory, arrays, TABLE_VERSION, [source_path], entities=len(self.ids))
+
+    @classmethod
+    def load(cls, directory, verbose=True, mmap=True):
+        _, arrays = load_arrays(directory, ('ids',) + StringTable.array_names('description'), mmap)
+        return cls(arrays['ids'], StringTable.from_arrays(arrays, 'description'), verbose)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, entity):
+        number = entity_number(entity)
+        if number is None:
+            return None
+        row = int(np.searchsorted(self.ids, number))
+        if row < len(self.ids) and self.ids[row] == number:
+            return row
+        return None
+
+    def describe(self, entity):
+        """The descriptions of an item ('Q42'), as a list (empty if it has none)."""
+        if not self.verbose:
+            return []
+        row = self.row(entity)
+        if row is None:
+            return []
+        descriptions = self.descriptions[row]
+        return descriptions.split(SEPARATOR) if descriptions else []
+
+def load_description_table(directory, graph_path, graph, verbose=True):
+    """Load the table written for the current graph file, or build it from `graph` and save it.
+
+    Without `verbose` descriptions are never printed, so the graph is not
+    scanned and an empty table is returned.
+    """
+    if not verbose:
+        return DescriptionTable.empty()
+    if is_store_valid(directory, TABLE_VERSION, [graph_path]):
+        return DescriptionTable.load(directory, verbose)
+    print(f"--- Building the entity description table in {directory} ---")
+    table = DescriptionTable.from_graph(graph, verbose)
+    table.save(directory, graph_path)
+    return table
@@ -0,0 +1,190 @@
+import numpy as np
+from src.indexing.type_index import wd_id
+from src.indexing.array_store import is_store_valid, save_arrays, load_arrays
+
+PARTITION_VERSION = 1
+
+class EmbeddingIndex():
+    """Euclidean top-k search over the rows of an embedding matrix.
+
+    The matrix is kept as one contiguous float32 block with its squared row
+    norms cached, so a scan is a single matrix product. `argpartition` picks a
+    few more candidates than asked for, and those are re-scored in float64
+    and sorted, so the exact mode returns the same neighbours as a full
+    `pairwise_distances` + `argsort`.
+
+    With `approximate=True` an inverted-file (IVF) index is built as well: the
+    rows are clustered with a few rounds of k-means, and a query only scans
+    the `n_probe` clusters closest to it. Raising `n_probe` trades latency
+    for recall; `n_probe == n_lists` is an exact scan again.
+    """
+    def __init__(self, matrix, approximate=False, n_lists=1024, n_probe=32, rescore_margin=16, seed=0):
+        # a float32 memory map (or a slice of one) is used in place, not copied
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self.rescore_margin = rescore_margin
+        self.approximate = approximate
+        self.n_probe = n_probe
+        if approximate:
+            self.build_ivf(min(n_lists, len(self.matrix)), seed)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def build_ivf(self, n_lists, seed=0, n_iter=10, chunk_size=65536):
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self.matrix), n_lists * 64)
+        sample = self.matrix[rng.choice(len(self.matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self.nearest_centroids(sample, centroids, 1)[:, 0]
+            for cluster in range(n_lists):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+        assignment = np.concatenate([
+            self.nearest_centroids(self.matrix[start:start + chunk_size], centroids, 1)[:, 0]
+            for start in range(0, len(self.matrix), chunk_size)
+        ])
+        self.centroids = centroids
+        self.list_rows = np.argsort(assignment, kind='stable').astype(np.int64)
+        self.list_offsets = np.searchsorted(assignment[self.list_rows], np.arange(n_lists + 1))
+
+    @staticmethod
+    def nearest_centroids(vectors, centroids, n):
+        distances = (centroids * centroids).sum(axis=1)[None, :] - 2 * vectors @ centroids.T
+        n = min(n, len(centroids))
+        nearest = np.argpartition(distances, n - 1, axis=1)[:, :n]
+        order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+        return np.take_along_axis(nearest, order, axis=1)
+
+    def rescore(self, query, candidates, k):
+        """Exact float64 distances for a set of candidate rows; returns the k closest."""
+        diff = self.matrix[candidates].astype(np.float64) - query.astype(np.float64)
+        distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        order = np.lexsort((candidates, distances))[:k]
+        return candidates[order], distances[order]
+
+    def search(self, queries, k=1, approximate=None):
+        """Return (ids, distances), each of shape (n_queries, k), closest first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self.matrix))
+        if approximate is None:
+            approximate = self.approximate
+        if approximate:
+            return self.search_ivf(queries, k)
+        sq_distances = self.sq_norms[None, :] - 2 * queries @ self.matrix.T
+        n_candidates = min(k + self.rescore_margin, len(self.matrix))
+        if n_candidates < len(self.matrix):
+            candidates = np.argpartition(sq_distances, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self.matrix)), sq_distances.shape)
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        distances = np.empty((len(queries), k), dtype=np.float64)
+        for row, query in enumerate(queries):
+            ids[row], distances[row] = self.rescore(query, candidates[row], k)
+        return ids, distances
+
+    def search_ivf(self, queries, k):
+        probes = self.nearest_centroids(queries, self.centroids, self.n_probe)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float64)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[cluster]:self.list_offsets[cluster + 1]] for cluster in probes[row]
+            ])
+            found_ids, found_distances = self.rescore(query, candidates, k)
+            ids[row, :len(found_ids)] = found_ids
+            distances[row, :len(found_ids)] = found_distances
+        return ids, distances
+
+def type_partitions(n_rows, id2ent, type_index):
+    """Embedding row IDs by the `TypeIndex` kind of their entity."""
+    kinds = dict()
+    for row in range(n_rows):
+        kind = type_index.kind(wd_id(id2ent[row])) if type_index is not None else 'other'
+        kinds.setdefault(kind, []).append(row)
+    return kinds
+
+def reorder_rows(matrix, partitions):
+    """Copy of the matrix with the rows of each partition next to each other.
+
+    Returns the reordered float32 matrix, the original row ID of each of its
+    rows and the (start, end) rows of every non-empty partition.
+    """
+    names = [name for name in partitions if len(partitions[name])]
+    row_ids = np.concatenate([np.asarray(partitions[name], dtype=np.int64) for name in names]) if names else np.arange(len(matrix))
+    if len(row_ids) != len(matrix):
+        raise ValueError("The partitions have to cover every row of the matrix exactly once.")
+    ordered = np.ascontiguousarray(np.asarray(matrix)[row_ids], dtype=np.float32)
+    bounds = dict()
+    start = 0
+    for name in names:
+        bounds[name] = (start, start + len(partitions[name]))
+        start += len(partitions[name])
+    return ordered, row_ids, bounds
+
+def save_partitions(directory, ordered, row_ids, bounds, sources):
+    bounds = [[name, start, end] for name, (start, end) in bounds.items()]
+    save_arrays(directory, {'ordered': ordered, 'row_ids': row_ids}, PARTITION_VERSION, sources, bounds=bounds)
+
+class PartitionedEmbeddingIndex():
+    """An `EmbeddingIndex` per entity type (films, people, other), plus one over everything.
+
+    The matrix rows are reordered once so that each partition is a contiguous
+    slice of a single copy (`ordered`); the sub-indices are views on it and
+    `row_ids` maps their rows back to the original embedding IDs. A search
+    restricted to one partition only scans that slice, so off-type entities
+    never use up top-k slots. `save` writes the reordered copy as a .npy file,
+    so that `load` can memory-map it instead of copying the matrix again.
+    """
+    def __init__(self, ordered, row_ids, bounds, **index_kwargs):
+        self.ordered = ordered
+        self.row_ids = row_ids
+        self.bounds = bounds
+        self.full = EmbeddingIndex(ordered, **index_kwargs)
+        self.partitions = dict()
+        for name, (start, end) in bounds.items():
+            self.partitions[name] = (start, EmbeddingIndex(ordered[start:end], **index_kwargs))
+
+    @classmethod
+    def from_partitions(cls, matrix, partitions, **index_kwargs):
+        """Build the index from the matrix; `partitions` maps a name to its embedding row IDs."""
+        return cls(*reorder_rows(matrix, partitions), **index_kwargs)
+
+    @classmethod
+    def from_types(cls, matrix, id2ent, type_index, **index_kwargs):
+        return cls.from_partitions(matrix, type_partitions(len(matrix), id2ent, type_index), **index_kwargs)
+
+    def save(self, directory, sources):
+        save_partitions(directory, self.ordered, self.row_ids, self.bounds, sources)
+
+    @classmethod
+    def load(cls, directory, mmap=True, **index_kwargs):
+        meta, arrays = load_arrays(directory, ('ordered', 'row_ids'), mmap)
+        bounds = {name: (start, end) for name, start, end in meta['bounds']}
+        return cls(arrays['ordered'], arrays['row_ids'], bounds, **index_kwargs)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def partition_sizes(self):
+        return {name: len(index) for name, (_, index) in self.partitions.items()}
+
+    def search(self, queries, k=1, partition=None, approximate=None):
+        """Like `EmbeddingIndex.search`, restricted to one partition if it is known."""
+        if partition in self.partitions:
+            offset, index = self.partitions[partition]
+        else:
+            offset, index = 0, self.full
+        ids, distances = index.search(queries, k, approximate=approximate)
+        ids = np.where(ids >= 0, self.row_ids[np.maximum(ids, 0) + offset], -1)
+        return ids, distances
+
+def load_partitioned_index(directory, matrix, id2ent, type_index, sources, **index_kwargs):
+    """Memory-map the partitioned matrix saved for the current sources, or build and save it."""
+    if not is_store_valid(directory, PARTITION_VERSION, sources):
+        print(f"--- Partitioning the entity embeddings in {directory} ---")
+        partitions = type_partitions(len(matrix), id2ent, type_index)
+        save_partitions(directory, *reorder_rows(matrix, partitions), sources)
+    return PartitionedEmbeddingIndex.load(directory, **index_kwargs)
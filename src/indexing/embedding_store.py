@@ -0,0 +1,142 @@
+import os
+import csv
+import time
+import threading
+import numpy as np
+from src.indexing.array_store import StringTable, is_store_valid, save_arrays, load_arrays
+from src.indexing.embedding_index import load_partitioned_index
+from src.indexing.link_prediction import LinkPredictor
+from src.indexing.type_index import load_type_index, type_index_path
+from src.utils import load_pickle, load_data_config, load_bot_config
+
+STORE_VERSION = 1
+TABLE_NAMES = ('entities', 'relations', 'labels')
+
+def read_id_file(path):
+    """Names of a '<id>\\t<name>' embedding ID file, as a list indexed by ID."""
+    with open(path, 'r') as f:
+        rows = [(int(idx), name) for idx, name in csv.reader(f, delimiter='\t')]
+    names = [None] * len(rows)
+    for idx, name in rows:
+        names[idx] = name
+    return names
+
+class EmbeddingStore():
+    """The TransE embeddings and everything the handlers look up next to them.
+
+    There is one store per process (see `get_embedding_store`), shared by the
+    factual and recommendation handlers. The embedding matrices are
+    memory-mapped from their .npy files. Entity and relation URIs are
+    `StringTable`s whose row is the embedding ID, and `labels` holds the
+    ent2lbl label of every entity row, so neither the URI dictionaries nor
+    ent2lbl are kept in memory. `build_indexes` adds the nearest-neighbour
+    index, whose partitioned copy of the matrix is memory-mapped as well, and
+    the link predictor.
+    """
+    def __init__(self, entity_emb, relation_emb, entities, relations, labels):
+        self.entity_emb = entity_emb
+        self.relation_emb = relation_emb
+        self.entities = entities
+        self.relations = relations
+        self.labels = labels
+        self.entity_index = None
+        self.link_predictor = None
+
+    @classmethod
+    def from_files(cls, entity_emb, relation_emb, entity_file, relation_file, ent2lbl_path):
+        entity_names = read_id_file(entity_file)
+        ent2lbl = {str(ent): lbl for ent, lbl in (load_pickle(ent2lbl_path) or {}).items()}
+        labels = StringTable.from_strings([ent2lbl.get(name, '') for name in entity_names], searchable=False)
+        del ent2lbl
+        return cls(entity_emb, relation_emb, StringTable.from_strings(entity_names), StringTable.from_strings(read_id_file(relation_file)), labels)
+
+    def build_indexes(self, type_index, relation_ranges, partition_directory, partition_sources, embedding_search, link_prediction):
+        """Partition the entity embeddings by type and set up TransE link prediction.
+
+        The partitioned matrix is saved in `partition_directory` and reused
+        while the `partition_sources` files are unchanged. `relation_ranges`
+        maps a predicate URI to the type of its objects.
+        """
+        self.entity_index = load_partitioned_index(partition_directory, self.entity_emb, self.entities, type_index, partition_sources, **embedding_search)
+        ranges = {self.relations.get(pred): kind for pred, kind in relation_ranges.items() if pred in self.relations}
+        self.link_predictor = LinkPredictor(self.entity_emb, self.relation_emb, self.entity_index, ranges, **link_prediction)
+
+    def entity_id(self, uri):
+        """Embedding ID of an entity URI; KeyError if it has no embedding."""
+        return self.entities.index(str(uri))
+
+    def relation_id(self, uri):
+        return self.relations.index(str(uri))
+
+    def entity(self, row):
+        return self.entities[row]
+
+    def label(self, row):
+        """Label of the entity with that embedding ID, or None if it has none."""
+        return self.labels[row] or None
+
+    def save_tables(self, directory, sources):
+        arrays = dict()
+        for name in TABLE_NAMES:
+            arrays.update(getattr(self, name).arrays(name))
+        save_arrays(directory, arrays, STORE_VERSION, sources, entities=len(self.entities))
+
+    @staticmethod
+    def load_tables(directory, mmap=True):
+        _, arrays = load_arrays(directory, [array_name for name in TABLE_NAMES for array_name in StringTable.array_names(name)], mmap)
+        return [StringTable.from_arrays(arrays, name) for name in TABLE_NAMES]
+
+def load_embedding_store(paths_embeddings, table_directory, ent2lbl_path):
+    """Memory-map the embeddings and the tables written for the current ID files and ent2lbl, or build the tables."""
+    start_time = time.time()
+    entity_emb = np.load(paths_embeddings['entity_emb'], mmap_mode='r')
+    relation_emb = np.load(paths_embeddings['relation_emb'], mmap_mode='r')
+    sources = [paths_embeddings['entity_file'], paths_embeddings['relation_file'], ent2lbl_path]
+    if is_store_valid(table_directory, STORE_VERSION, sources):
+        store = EmbeddingStore(entity_emb, relation_emb, *EmbeddingStore.load_tables(table_directory))
+    else:
+        print(f"--- Building the embedding tables in {table_directory} ---")
+        store = EmbeddingStore.from_files(entity_emb, relation_emb, *sources)
+        store.save_tables(table_directory, sources)
+    print(f"--- Loaded embeddings of {len(store.entities)} entities in: {time.time() - start_time} seconds ---")
+    return store
+
+embedding_store = None
+embedding_store_lock = threading.Lock()
+
+def get_embedding_store(type_index=None):
+    """The process' `EmbeddingStore` with its indexes, loaded on first use.
+
+    `type_index` partitions the entity index; it is loaded from its pickle
+    when not given.
+    """
+    global embedding_store
+    with embedding_store_lock:
+        if embedding_store is None:
+            data_config = load_data_config()
+            bot_config = load_bot_config()
+            paths_embeddings = data_config['paths_embeddings']
+            paths_processed = data_config['paths_processed']
+            store = load_embedding_store(paths_embeddings, paths_processed['embedding_tables'], paths_processed['ent2lbl'])
+            if type_index is None:
+                type_index = load_type_index(paths_processed['entity_types'], paths_processed['updated_graph'])
+            # the partitions only change with the embeddings or the entity types of the bot's graph
+            partition_sources = [
+                paths_embeddings['entity_emb'], paths_embeddings['entity_file'],
+                type_index_path(paths_processed['entity_types'], paths_processed['updated_graph'])
+            ]
+            store.build_indexes(
+                type_index, load_pickle(paths_processed['relation_ranges']) or {},
+                os.path.join(paths_processed['embedding_tables'], 'partitions'), partition_sources,
+                bot_config['embedding_search'], bot_config['link_prediction']
+            )
+            embedding_store = store
+        return embedding_store
+
+def reset_embedding_store():
+    """Forget the process' store, so that the next `get_embedding_store` loads the files again."""
+    global embedding_store
+    with embedding_store_lock:
+        if embedding_store is not None and embedding_store.link_predictor is not None:
+            embedding_store.link_predictor.clear()
+        embedding_store = None
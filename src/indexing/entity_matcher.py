@@ -0,0 +1,74 @@
+from collections import deque
+
+class EntityMatcher():
+    """Aho-Corasick automaton over the labels of an {entity: label} dictionary.
+
+    `find` reports every label occurring in a text in one pass over the text.
+    With `word_boundary` set, a match only counts if it is not glued to a
+    letter or digit on either side (so 'war' no longer matches in 'award').
+    """
+    def __init__(self, dictionary, word_boundary=True):
+        self.word_boundary = word_boundary
+        self.labels = list()
+        self.entities = list()
+        seen = set()
+        for entity, label in dictionary.items():
+            if not label or label in seen:
+                continue
+            seen.add(label)
+            self.labels.append(label)
+            self.entities.append(entity)
+        self.goto, self.fail, self.output = self.build(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def build(labels):
+        goto = [dict()]
+        output = [list()]
+        for pattern_idx, label in enumerate(labels):
+            state = 0
+            for char in label:
+                if char not in goto[state]:
+                    goto.append(dict())
+                    output.append(list())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append(pattern_idx)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state].extend(output[fail[next_state]])
+        return goto, fail, output
+
+    def is_bounded(self, text, start, end):
+        if start > 0 and text[start].isalnum() and text[start-1].isalnum():
+            return False
+        if end < len(text) and text[end-1].isalnum() and text[end].isalnum():
+            return False
+        return True
+
+    def find(self, text):
+        """Return (label, entity) pairs found in the text, in dictionary order."""
+        found = set()
+        state = 0
+        for idx, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern_idx in self.output[state]:
+                if pattern_idx in found:
+                    continue
+                end = idx + 1
+                start = end - len(self.labels[pattern_idx])
+                if not self.word_boundary or self.is_bounded(text, start, end):
+                    found.add(pattern_idx)
+        return [(self.labels[pattern_idx], self.entities[pattern_idx]) for pattern_idx in sorted(found)]
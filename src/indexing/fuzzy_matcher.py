@@ -0,0 +1,67 @@
+import numpy as np
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+def longest_match_size(pattern, candidate):
+    """Size of the longest common substring, scored exactly like `nlp_utils.best_match`."""
+    return SequenceMatcher(None, pattern, candidate).find_longest_match(0, len(pattern), 0, len(candidate)).size
+
+def char_ngrams(text, n):
+    return [text[i:i+n] for i in range(len(text) - n + 1)]
+
+class FuzzyMatcher():
+    """Character n-gram inverted index over a fixed list of labels.
+
+    A common substring of length L >= n covers L - n + 1 n-gram positions of
+    the candidate, so the number of candidate n-grams that also occur in the
+    pattern (plus n - 1) bounds its score. Candidates are scored with
+    SequenceMatcher in decreasing order of that bound, and the search stops as
+    soon as no remaining candidate can enter the top-k. Ties are broken by the
+    original list order, as in `best_match`.
+    """
+    def __init__(self, labels, n=3):
+        self.n = n
+        self.labels = tuple(dict.fromkeys(label for label in labels if label is not None))
+        postings = defaultdict(lambda: ([], []))
+        for idx, label in enumerate(self.labels):
+            for gram, count in Counter(char_ngrams(label, n)).items():
+                postings[gram][0].append(idx)
+                postings[gram][1].append(count)
+        self.postings = {
+            gram: (np.array(ids, dtype=np.int32), np.array(counts, dtype=np.int32))
+            for gram, (ids, counts) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.labels)
+
+    def top_k(self, pattern, k=5):
+        """Return up to k (label, score) pairs, best first. Zero scores are dropped."""
+        hits = np.zeros(len(self.labels), dtype=np.int32)
+        for gram in set(char_ngrams(pattern, self.n)):
+            if gram in self.postings:
+                ids, counts = self.postings[gram]
+                hits[ids] += counts
+        candidates = np.flatnonzero(hits)
+        # sort by decreasing bound, then by original position
+        candidates = candidates[np.lexsort((candidates, -hits[candidates]))]
+        scored = list()
+        for idx in candidates:
+            bound = hits[idx] + self.n - 1
+            if len(scored) >= k and bound < scored[k-1][0]:
+                break
+            scored.append((longest_match_size(pattern, self.labels[idx]), int(idx)))
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            del scored[k:]
+        # nothing shares an n-gram: every score is below n, fall back to scoring everything
+        if not scored or scored[0][0] < self.n:
+            scored = [(longest_match_size(pattern, label), idx) for idx, label in enumerate(self.labels)]
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(self.labels[idx], score) for score, idx in scored[:k] if score > 0]
+
+    def best_match(self, pattern):
+        """Drop-in replacement for `best_match(pattern, labels)`."""
+        ranked = self.top_k(pattern, k=1)
+        if not ranked:
+            return None
+        return ranked[0][0]
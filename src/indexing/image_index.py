@@ -0,0 +1,60 @@
+import os
+from src.global_variables import WDT
+from src.indexing.type_index import wd_id
+from src.indexing.array_store import file_signature
+from src.indexing.image_table import load_image_table
+from src.utils import save_pickle, load_pickle
+
+INDEX_VERSION = 2
+
+class ImageIndex():
+    """Image lookups by Wikidata entity, on top of an `ImageTable`.
+
+    `imdb_ids` maps a Wikidata entity ('Q42') to its IMDb IDs (wdt:P345).
+    - `solo_images` finds the images whose cast is exactly the entity's
+      IMDb IDs, i.e. the images showing that person alone;
+    - `cast_images` finds every image a person appears in;
+    - `movie_images` finds every image of a movie.
+    All of them return image file names in images.json order, optionally
+    of a single type ('poster', 'still_frame', ...).
+    """
+    def __init__(self, table, imdb_ids):
+        self.table = table
+        self.imdb_ids = imdb_ids
+
+    @staticmethod
+    def imdb_ids_from_graph(graph):
+        imdb_ids = dict()
+        for s, o in graph.subject_objects(str(WDT['P345'])):
+            entity = wd_id(s)
+            if entity is not None:
+                imdb_ids.setdefault(entity, []).append(o)
+        return {entity: tuple(ids) for entity, ids in imdb_ids.items()}
+
+    def images(self, rows, img_type=None):
+        if img_type is not None:
+            rows = self.table.of_type(rows, img_type)
+        return [self.table.img(row) for row in rows]
+
+    def solo_images(self, entity, img_type=None):
+        """Images whose cast is exactly the entity's IMDb IDs."""
+        return self.images(self.table.exact_cast_rows(self.imdb_ids.get(entity, ())), img_type)
+
+    def cast_images(self, entity, img_type=None):
+        return [img for imdb_id in self.imdb_ids.get(entity, ()) for img in self.images(self.table.cast_rows(imdb_id), img_type)]
+
+    def movie_images(self, entity, img_type=None):
+        return [img for imdb_id in self.imdb_ids.get(entity, ()) for img in self.images(self.table.movie_rows(imdb_id), img_type)]
+
+def load_image_index(path, table_directory, images_path, graph_path, graph):
+    """Load the image table and the entity -> IMDb ID map saved for the current files, or build them."""
+    table = load_image_table(table_directory, images_path)
+    if os.path.exists(path):
+        data = load_pickle(path)
+        if data is not None and data.get('version') == INDEX_VERSION and data.get('source') == file_signature(graph_path):
+            return ImageIndex(table, data['imdb_ids'])
+    print(f"--- Building the entity -> IMDb ID map in {path} ---")
+    imdb_ids = ImageIndex.imdb_ids_from_graph(graph)
+    save_pickle({'version': INDEX_VERSION, 'source': file_signature(graph_path), 'imdb_ids': imdb_ids}, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return ImageIndex(table, imdb_ids)
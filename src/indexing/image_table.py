@@ -0,0 +1,194 @@
+import json
+import numpy as np
+from array import array
+from src.indexing.array_store import StringTable, is_store_valid, save_arrays, load_arrays
+
+TABLE_VERSION = 1
+TABLE_ARRAYS = (
+    'type_codes', 'cast_offsets', 'cast_ids', 'movie_offsets', 'movie_ids',
+    'cast_post_offsets', 'cast_post_rows', 'movie_post_offsets', 'movie_post_rows'
+)
+
+def iter_json_array(path, chunk_size=1 << 20):
+    """Yield the elements of a top-level JSON array one at a time, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            # skip the whitespace and the comma between two elements
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                element, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield element
+
+def as_id_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+def postings(offsets, ids, n_ids):
+    """Invert row -> IDs (CSR) into ID -> rows (CSR, rows ascending)."""
+    rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+    order = np.argsort(ids, kind='stable')
+    post_offsets = np.searchsorted(ids[order], np.arange(n_ids + 1)).astype(np.int64)
+    return post_offsets, np.ascontiguousarray(rows[order])
+
+class ImageTable():
+    """The fields of images.json the bot uses (img, type, cast, movie), in columnar form.
+
+    IMDb IDs are interned: `ids` is a sorted `StringTable` of the ID strings,
+    and the cast and movie of image i are the ID numbers
+    `cast_ids[cast_offsets[i]:cast_offsets[i+1]]` (same for movies). Image
+    file names are a `StringTable` in image order and types are one byte
+    codes into `types`. The `*_post_*` arrays map an ID number back to the
+    rows it appears in. Everything is a NumPy array, so a saved table is
+    memory-mapped instead of parsed.
+    """
+    def __init__(self, ids, imgs, type_codes,
+                 cast_offsets, cast_ids, movie_offsets, movie_ids,
+                 cast_post_offsets, cast_post_rows, movie_post_offsets, movie_post_rows, types):
+        self.ids = ids
+        self.imgs = imgs
+        self.type_codes = type_codes
+        self.cast_offsets = cast_offsets
+        self.cast_ids = cast_ids
+        self.movie_offsets = movie_offsets
+        self.movie_ids = movie_ids
+        self.cast_post_offsets = cast_post_offsets
+        self.cast_post_rows = cast_post_rows
+        self.movie_post_offsets = movie_post_offsets
+        self.movie_post_rows = movie_post_rows
+        self.types = list(types)
+        self.type_code = {img_type: code for code, img_type in enumerate(self.types)}
+
+    @classmethod
+    def from_json(cls, path):
+        """Build the table while streaming through images.json, one record at a time."""
+        ids = dict()
+        types = dict()
+        img_lengths, img_blob = array('q'), bytearray()
+        type_codes = bytearray()
+        cast_lengths, cast_ids = array('q'), array('i')
+        movie_lengths, movie_ids = array('q'), array('i')
+        for elem in iter_json_array(path):
+            img = elem['img'].encode('utf-8')
+            img_lengths.append(len(img))
+            img_blob += img
+            code = types.setdefault(elem['type'], len(types))
+            if code > 255:
+                raise ValueError(f"{path} has more than 256 image types")
+            type_codes.append(code)
+            cast = as_id_list(elem.get('cast'))
+            cast_lengths.append(len(cast))
+            cast_ids.extend(ids.setdefault(imdb_id, len(ids)) for imdb_id in cast)
+            movies = as_id_list(elem.get('movie'))
+            movie_lengths.append(len(movies))
+            movie_ids.extend(ids.setdefault(imdb_id, len(ids)) for imdb_id in movies)
+        # renumber the IDs in sorted order so that they can be found by binary search
+        id_list = list(ids)
+        del ids
+        order = sorted(range(len(id_list)), key=id_list.__getitem__)
+        rank = np.empty(len(id_list), dtype=np.int32)
+        rank[order] = np.arange(len(id_list), dtype=np.int32)
+        ids = StringTable.from_sorted([id_list[idx] for idx in order])
+
+        def offsets_of(lengths):
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=offsets[1:])
+            return offsets
+
+        cast_offsets, movie_offsets = offsets_of(cast_lengths), offsets_of(movie_lengths)
+        cast_ids = rank[np.frombuffer(cast_ids, dtype=np.int32)]
+        movie_ids = rank[np.frombuffer(movie_ids, dtype=np.int32)]
+        return cls(
+            ids, StringTable(offsets_of(img_lengths), np.frombuffer(bytes(img_blob), dtype=np.uint8)),
+            np.frombuffer(bytes(type_codes), dtype=np.uint8),
+            cast_offsets, cast_ids, movie_offsets, movie_ids,
+            *postings(cast_offsets, cast_ids, len(id_list)),
+            *postings(movie_offsets, movie_ids, len(id_list)),
+            types=list(types)
+        )
+
+    def save(self, directory, source_path):
+        arrays = self.ids.arrays('id')
+        arrays.update(self.imgs.arrays('img'))
+        arrays.update((name, getattr(self, name)) for name in TABLE_ARRAYS)
+        save_arrays(directory, arrays, TABLE_VERSION, [source_path], images=len(self), types=self.types)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        meta, arrays = load_arrays(directory, StringTable.array_names('id') + StringTable.array_names('img') + TABLE_ARRAYS, mmap)
+        return cls(
+            StringTable.from_arrays(arrays, 'id'), StringTable.from_arrays(arrays, 'img'),
+            *[arrays[name] for name in TABLE_ARRAYS], types=meta['types']
+        )
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def id_number(self, imdb_id):
+        """Interned number of an IMDb ID, or None if no image has it."""
+        return self.ids.get(imdb_id)
+
+    def img(self, row):
+        return self.imgs[row]
+
+    def cast(self, row):
+        return self.cast_ids[self.cast_offsets[row]:self.cast_offsets[row + 1]]
+
+    def rows_with(self, imdb_id, post_offsets, post_rows):
+        number = self.id_number(imdb_id)
+        if number is None:
+            return np.zeros(0, dtype=np.int32)
+        return post_rows[post_offsets[number]:post_offsets[number + 1]]
+
+    def cast_rows(self, imdb_id):
+        """Rows of the images whose cast includes the IMDb ID."""
+        return self.rows_with(imdb_id, self.cast_post_offsets, self.cast_post_rows)
+
+    def movie_rows(self, imdb_id):
+        return self.rows_with(imdb_id, self.movie_post_offsets, self.movie_post_rows)
+
+    def exact_cast_rows(self, imdb_ids):
+        """Rows of the images whose cast is exactly `imdb_ids` (in that order); none without IDs."""
+        if len(imdb_ids) == 0:
+            # an entity without an IMDb ID has no images, not those of every cast-less one
+            return np.zeros(0, dtype=np.int32)
+        numbers = [self.id_number(imdb_id) for imdb_id in imdb_ids]
+        if None in numbers:
+            return np.zeros(0, dtype=np.int32)
+        return np.array([row for row in self.cast_rows(imdb_ids[0]) if self.cast(row).tolist() == numbers], dtype=np.int32)
+
+    def of_type(self, rows, img_type):
+        code = self.type_code.get(img_type)
+        if code is None:
+            return rows[:0]
+        return rows[self.type_codes[rows] == code]
+
+def load_image_table(directory, images_path):
+    """Memory-map the table saved for the current images.json, or stream the file and save it."""
+    if is_store_valid(directory, TABLE_VERSION, [images_path]):
+        return ImageTable.load(directory)
+    print(f"--- Building the image table in {directory} ---")
+    table = ImageTable.from_json(images_path)
+    table.save(directory, images_path)
+    return table
@@ -0,0 +1,61 @@
+import string
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+from src.utils import load_pickle
+
+_punctuation_table = str.maketrans('', '', string.punctuation + '’‘“”–—')
+
+def normalize_label(label):
+    """Case-fold a label, drop punctuation, collapse whitespace and a leading 'the'."""
+    normalized = ' '.join(label.translate(_punctuation_table).casefold().split())
+    if normalized.startswith('the '):
+        normalized = normalized[len('the '):]
+    return normalized
+
+class LabelIndex():
+    """Inverted label -> entity index over an {entity: label} dictionary.
+
+    A label can map to several entities. Ids are kept in the dictionary's
+    insertion order, so `get` returns the first key holding the label.
+    """
+    def __init__(self, dictionary):
+        self.dictionary = MappingProxyType(dict(dictionary))
+        exact = defaultdict(list)
+        normalized = defaultdict(list)
+        for entity, label in self.dictionary.items():
+            if label is None:
+                continue
+            exact[label].append(entity)
+            normalized[normalize_label(label)].append(entity)
+        self.exact = MappingProxyType({label: tuple(ids) for label, ids in exact.items()})
+        self.normalized = MappingProxyType({label: tuple(ids) for label, ids in normalized.items()})
+
+    def __contains__(self, label):
+        return label in self.exact
+
+    def __len__(self):
+        return len(self.dictionary)
+
+    def get(self, label):
+        """Return the first entity with exactly this label, or None."""
+        ids = self.exact.get(label)
+        if ids is None:
+            print(f"Warning: '{label}' not found in dictionary.")
+            return None
+        return ids[0]
+
+    def get_all(self, label):
+        """Return all entities with exactly this label."""
+        return self.exact.get(label, ())
+
+    def find(self, label):
+        """Return all entities whose normalized label matches the normalized query."""
+        if label is None:
+            return ()
+        return self.normalized.get(normalize_label(label), ())
+
+@lru_cache(maxsize=None)
+def load_label_index(pickle_file_path):
+    """Load an {entity: label} pickle and index it; shared by all callers."""
+    return LabelIndex(load_pickle(pickle_file_path))
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+
+class LinkPredictor():
+    """Batched TransE tail prediction (head + relation ~ tail) with a bounded LRU cache.
+
+    Heads and relations are embedding row IDs. Results are cached per
+    (head, relation, k), and the cache misses of a batch are scored together,
+    one `search` call per range type. `relation_ranges` maps a relation ID to
+    the partition of `entity_index` its tails are searched in (e.g. 'person'
+    for director); relations without a known range search every entity.
+    """
+    def __init__(self, entity_emb, relation_emb, entity_index, relation_ranges=None, cache_size=4096):
+        self.entity_emb = entity_emb
+        self.relation_emb = relation_emb
+        self.entity_index = entity_index
+        self.relation_ranges = relation_ranges if relation_ranges is not None else dict()
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def predict(self, pairs, k=1):
+        """Return the k most plausible tail IDs (a tuple) for each (head, relation) pair."""
+        results = [None] * len(pairs)
+        missing = OrderedDict()
+        with self.lock:
+            for position, (head, relation) in enumerate(pairs):
+                key = (head, relation, k)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    results[position] = self.cache[key]
+                else:
+                    self.misses += 1
+                    missing.setdefault(key, []).append(position)
+        by_range = OrderedDict()
+        for key in missing:
+            by_range.setdefault(self.relation_ranges.get(key[1]), []).append(key)
+        for partition, keys in by_range.items():
+            heads = [head for head, _, _ in keys]
+            relations = [relation for _, relation, _ in keys]
+            queries = self.entity_emb[heads] + self.relation_emb[relations]
+            ids, _ = self.entity_index.search(queries, k, partition=partition)
+            with self.lock:
+                for key, row in zip(keys, ids):
+                    positions = missing[key]
+                    tails = tuple(int(idx) for idx in row if idx >= 0)
+                    for position in positions:
+                        results[position] = tails
+                    self.cache[key] = tails
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+        return results
+
+    def predict_one(self, head, relation, k=1):
+        return self.predict([(head, relation)], k)[0]
+
+    def clear(self):
+        """Drop every cached prediction, e.g. when the embeddings are reloaded."""
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self.cache)
+            }
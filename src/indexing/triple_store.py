@@ -0,0 +1,264 @@
+import re
+import numpy as np
+import rdflib
+from src.indexing.array_store import StringTable, is_store_valid, save_arrays, load_arrays
+
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+
+SNAPSHOT_VERSION = 2
+TRIPLE_ARRAYS = ('s_offsets', 'sp_pred', 'sp_obj', 'o_offsets', 'op_pred', 'op_subj')
+
+# N-Triples terms: <iri>, _:blank, "literal"@lang / "literal"^^<datatype>
+_term_pattern = re.compile(r'\s*(?:<([^>]*)>|(_:\S+)|"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?)')
+_escape_pattern = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_escapes = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+def _unescape(match):
+    code = match.group(1) or match.group(2)
+    if code is not None:
+        return chr(int(code, 16))
+    return _escapes.get(match.group(3), match.group(3))
+
+def literal_key(lexical, lang=None, datatype=None):
+    """Key of a literal term: the N-Triples form without escaping.
+
+    Typed literals get the lexical form rdflib gives them, e.g. "5.5E7" of
+    an xsd:decimal is "55000000", so that both backends return the same values.
+    """
+    if lang:
+        return '"{}"@{}'.format(lexical, lang)
+    if datatype:
+        return '"{}"^^{}'.format(str(rdflib.Literal(lexical, datatype=datatype)), datatype)
+    return '"{}"'.format(lexical)
+
+def term_key(term):
+    """Key of an rdflib term. IRIs are their own key."""
+    if isinstance(term, rdflib.Literal):
+        return literal_key(str(term), term.language, term.datatype)
+    if isinstance(term, rdflib.BNode):
+        return '_:' + str(term)
+    return str(term)
+
+def term_value(key):
+    """Python value of a term key: the IRI itself or the literal's lexical form."""
+    if key.startswith('"'):
+        return key[1:key.rindex('"')]
+    return key
+
+def parse_ntriples_line(line):
+    """Return the (subject, predicate, object) keys of an N-Triples line, or None for blank/comment lines."""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    keys = list()
+    pos = 0
+    for _ in range(3):
+        match = _term_pattern.match(line, pos)
+        if match is None:
+            raise ValueError(f"Not an N-Triples line: {line}")
+        iri, blank, lexical, lang, datatype = match.groups()
+        if iri is not None:
+            keys.append(iri)
+        elif blank is not None:
+            keys.append(blank)
+        else:
+            keys.append(literal_key(_escape_pattern.sub(_unescape, lexical), lang, datatype))
+        pos = match.end()
+    if line[pos:].strip() != '.':
+        raise ValueError(f"Not an N-Triples line: {line}")
+    return keys
+
+class TripleStore():
+    """Read-only, dictionary-encoded triple store backed by NumPy arrays.
+
+    Terms are sorted and stored once in a `StringTable`, so a term's integer
+    ID is its rank and `term_id` is a binary search. Triples are kept twice in CSR layout: sorted by
+    (subject, predicate, object) with `s_offsets`, and sorted by
+    (object, predicate, subject) with `o_offsets`.
+
+    Terms are passed as IRIs (or literal keys, see `literal_key`) and returned
+    as IRIs or literal lexical forms, both as plain strings.
+    """
+    def __init__(self, terms, s_offsets, sp_pred, sp_obj, o_offsets, op_pred, op_subj):
+        self.terms = terms
+        self.s_offsets = s_offsets
+        self.sp_pred = sp_pred
+        self.sp_obj = sp_obj
+        self.o_offsets = o_offsets
+        self.op_pred = op_pred
+        self.op_subj = op_subj
+
+    @classmethod
+    def from_triples(cls, triples):
+        """Build the store from an iterable of (subject, predicate, object) keys."""
+        ids = dict()
+        encoded = list()
+        for triple in triples:
+            for key in triple:
+                encoded.append(ids.setdefault(key, len(ids)))
+        terms = list(ids)
+        del ids
+        # renumber the terms in sorted order so that IDs can be found by binary search
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        rank = np.empty(len(terms), dtype=np.int32)
+        rank[order] = np.arange(len(terms), dtype=np.int32)
+        spo = rank[np.array(encoded, dtype=np.int32)].reshape(-1, 3)
+        spo = np.unique(spo, axis=0)
+
+        n_terms = len(terms)
+        terms = StringTable.from_sorted([terms[idx] for idx in order])
+        s_offsets = np.searchsorted(spo[:, 0], np.arange(n_terms + 1)).astype(np.int64)
+        ops = spo[np.lexsort((spo[:, 0], spo[:, 1], spo[:, 2]))]
+        o_offsets = np.searchsorted(ops[:, 2], np.arange(n_terms + 1)).astype(np.int64)
+        return cls(
+            terms,
+            s_offsets, np.ascontiguousarray(spo[:, 1]), np.ascontiguousarray(spo[:, 2]),
+            o_offsets, np.ascontiguousarray(ops[:, 1]), np.ascontiguousarray(ops[:, 0])
+        )
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build the store from an rdflib graph."""
+        return cls.from_triples((term_key(s), term_key(p), term_key(o)) for s, p, o in graph)
+
+    @classmethod
+    def from_ntriples(cls, path):
+        """Build the store straight from an N-Triples file, without rdflib."""
+        def read_triples():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    keys = parse_ntriples_line(line)
+                    if keys is not None:
+                        yield keys
+        return cls.from_triples(read_triples())
+
+    @classmethod
+    def from_file(cls, path, format='turtle'):
+        """Build the store from a graph file, going through rdflib if it is not plain N-Triples."""
+        try:
+            return cls.from_ntriples(path)
+        except ValueError as e:
+            print(f"--- {e}; parsing {path} with rdflib instead ---")
+            return cls.from_graph(rdflib.Graph().parse(path, format=format))
+
+    def save(self, directory, source_path=None):
+        """Write the store as a snapshot directory of .npy arrays (see `save_arrays`)."""
+        arrays = self.terms.arrays('term')
+        arrays.update((name, getattr(self, name)) for name in TRIPLE_ARRAYS)
+        sources = [source_path] if source_path is not None else []
+        save_arrays(directory, arrays, SNAPSHOT_VERSION, sources, triples=len(self), terms=self.n_terms)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a snapshot directory, memory-mapping the arrays by default."""
+        _, arrays = load_arrays(directory, StringTable.array_names('term') + TRIPLE_ARRAYS, mmap)
+        return cls(StringTable.from_arrays(arrays, 'term'), *[arrays[name] for name in TRIPLE_ARRAYS])
+
+    def __len__(self):
+        return len(self.sp_pred)
+
+    @property
+    def n_terms(self):
+        return len(self.terms)
+
+    def term(self, term_id):
+        """Key of a term ID."""
+        return self.terms[term_id]
+
+    def term_id(self, key):
+        """ID of a term key, or None if the term is not in the graph."""
+        return self.terms.get(str(key))
+
+    def _slice(self, offsets, column_p, column_x, first, predicate):
+        first_id = self.term_id(first)
+        predicate_id = self.term_id(predicate)
+        if first_id is None or predicate_id is None:
+            return column_x[0:0]
+        lo, hi = offsets[first_id], offsets[first_id + 1]
+        predicates = column_p[lo:hi]
+        start = lo + np.searchsorted(predicates, predicate_id, side='left')
+        end = lo + np.searchsorted(predicates, predicate_id, side='right')
+        return column_x[start:end]
+
+    def object_ids(self, s, p):
+        return self._slice(self.s_offsets, self.sp_pred, self.sp_obj, s, p)
+
+    def subject_ids(self, p, o):
+        return self._slice(self.o_offsets, self.op_pred, self.op_subj, o, p)
+
+    def objects(self, s, p):
+        """Objects of all (s, p, ?) triples."""
+        return [term_value(self.term(term_id)) for term_id in self.object_ids(s, p)]
+
+    def subjects(self, p, o):
+        """Subjects of all (?, p, o) triples."""
+        return [term_value(self.term(term_id)) for term_id in self.subject_ids(p, o)]
+
+    def subject_objects(self, p):
+        """All (subject, object) pairs of a predicate."""
+        predicate_id = self.term_id(p)
+        if predicate_id is None:
+            return
+        positions = np.flatnonzero(self.sp_pred == predicate_id)
+        subjects = np.searchsorted(self.s_offsets, positions, side='right') - 1
+        for subject_id, object_id in zip(subjects, self.sp_obj[positions]):
+            yield term_value(self.term(subject_id)), term_value(self.term(object_id))
+
+    def label(self, x):
+        """The rdfs:label of a term, or None."""
+        labels = self.object_ids(x, RDFS_LABEL)
+        if len(labels) == 0:
+            return None
+        return term_value(self.term(labels[0]))
+
+def snapshot_path(graph_path):
+    """Snapshot directory of a graph file: lives right next to it."""
+    return graph_path + '.snapshot'
+
+def is_snapshot_valid(directory, source_path):
+    """True if the snapshot is complete and was written from the current source file."""
+    return is_store_valid(directory, SNAPSHOT_VERSION, [source_path])
+
+class RdflibStore():
+    """The `TripleStore` lookup API on top of an rdflib graph (the fallback backend)."""
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph)
+
+    @staticmethod
+    def to_term(key):
+        if key.startswith('"'):
+            end = key.rindex('"')
+            suffix = key[end+1:]
+            if suffix.startswith('@'):
+                return rdflib.Literal(key[1:end], lang=suffix[1:])
+            if suffix.startswith('^^'):
+                return rdflib.Literal(key[1:end], datatype=rdflib.URIRef(suffix[2:]))
+            return rdflib.Literal(key[1:end])
+        if key.startswith('_:'):
+            return rdflib.BNode(key[2:])
+        return rdflib.URIRef(key)
+
+    def objects(self, s, p):
+        return [str(o) for o in self.graph.objects(self.to_term(s), self.to_term(p))]
+
+    def subjects(self, p, o):
+        return [str(s) for s in self.graph.subjects(self.to_term(p), self.to_term(o))]
+
+    def subject_objects(self, p):
+        for s, o in self.graph.subject_objects(self.to_term(p)):
+            yield str(s), str(o)
+
+    def label(self, x):
+        label = self.graph.value(self.to_term(x), rdflib.RDFS.label)
+        if label is None:
+            return None
+        return str(label)
+
+def as_graph_store(graph):
+    """Wrap an rdflib graph in the store API; stores are returned unchanged."""
+    if isinstance(graph, rdflib.Graph):
+        return RdflibStore(graph)
+    return graph
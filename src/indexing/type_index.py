@@ -0,0 +1,131 @@
+import os
+import time
+from src.utils import load_pickle, save_pickle
+from src.indexing.array_store import file_signature
+from src.global_variables import film_entities, WD, WDT
+
+HUMAN = 'Q5'
+
+def wd_id(term):
+    """Strip the Wikidata entity namespace: 'http://www.wikidata.org/entity/Q5' -> 'Q5'."""
+    term = str(term)
+    if term.startswith(str(WD)):
+        return term[len(str(WD)):]
+    return None
+
+class TypeIndex():
+    """Entity -> bitmask of its `wdt:P31` classes, for the classes we care about.
+
+    Each tracked class (the film kinds from `film_entities` and human) gets one
+    bit, so `is_film` / `is_person` are a dictionary lookup and a bitwise and.
+    """
+    def __init__(self, masks=None, classes=None):
+        if classes is None:
+            classes = tuple(film_entities.values()) + (HUMAN,)
+        self.classes = tuple(classes)
+        self.bits = {cls: 1 << idx for idx, cls in enumerate(self.classes)}
+        self.film_mask = self.mask_of(film_entities.values())
+        self.person_mask = self.mask_of([HUMAN])
+        self.masks = masks if masks is not None else dict()
+
+    @classmethod
+    def from_graph(cls, graph, classes=None):
+        """Build the index from the `wdt:P31` triples of a graph."""
+        index = cls(classes=classes)
+        for subj, obj in graph.subject_objects(WDT['P31']):
+            bit = index.bits.get(wd_id(obj))
+            entity = wd_id(subj)
+            if bit is not None and entity is not None:
+                index.masks[entity] = index.masks.get(entity, 0) | bit
+        return index
+
+    def __len__(self):
+        return len(self.masks)
+
+    def mask_of(self, classes):
+        mask = 0
+        for cls in classes:
+            mask |= self.bits[cls]
+        return mask
+
+    def types(self, entity):
+        """Return the tracked classes of an entity."""
+        mask = self.masks.get(entity, 0)
+        return [cls for cls, bit in self.bits.items() if mask & bit]
+
+    def has_type(self, entity, mask):
+        return bool(self.masks.get(entity, 0) & mask)
+
+    def is_film(self, entity):
+        return self.has_type(entity, self.film_mask)
+
+    def is_person(self, entity):
+        return self.has_type(entity, self.person_mask)
+
+    def entities_with(self, mask):
+        """Return all entities having at least one of the classes in the mask."""
+        return [entity for entity, entity_mask in self.masks.items() if entity_mask & mask]
+
+    def kind(self, entity):
+        """Coarse type used to partition entities: 'film', 'person' or 'other'."""
+        if self.is_film(entity):
+            return 'film'
+        if self.is_person(entity):
+            return 'person'
+        return 'other'
+
+    def films(self):
+        return self.entities_with(self.film_mask)
+
+    def people(self):
+        return self.entities_with(self.person_mask)
+
+    def save(self, path, source_path=None):
+        """Pickle the index; `source_path` is the graph file it was built from."""
+        source = {'path': source_path, 'signature': file_signature(source_path)} if source_path is not None else None
+        save_pickle({'classes': self.classes, 'masks': self.masks, 'source': source}, path)
+
+    @classmethod
+    def load(cls, path, graph_path=None):
+        """Load a pickled index; None if there is none, if it was built from another
+        graph file than `graph_path`, or if that file has changed (or was not recorded) since."""
+        data = load_pickle(path)
+        if data is None or not is_source_current(data.get('source'), graph_path):
+            return None
+        return cls(masks=data['masks'], classes=data['classes'])
+
+def is_source_current(source, graph_path=None):
+    if source is None:
+        return False
+    if graph_path is not None and os.path.abspath(source['path']) != os.path.abspath(graph_path):
+        return False
+    try:
+        return file_signature(source['path']) == source['signature']
+    except OSError:
+        return False
+
+def type_index_path(path, graph_path):
+    """The pickle of the index of one graph file: 'entity_types.pickle' -> 'entity_types.updated_graph.pickle'."""
+    root, ext = os.path.splitext(path)
+    graph_name = os.path.splitext(os.path.basename(graph_path))[0]
+    return f"{root}.{graph_name}{ext}"
+
+def load_type_index(path, graph_path, graph=None):
+    """Load the type index of the `graph_path` graph from its pickle, building (and saving) it from `graph` if needed.
+
+    Each graph file has its own pickle (see `type_index_path`), which is
+    rebuilt when the graph file has changed since.
+    """
+    start_time = time.time()
+    path = type_index_path(path, graph_path)
+    if os.path.exists(path):
+        type_index = TypeIndex.load(path, graph_path)
+        if type_index is not None:
+            print(f"--- Loaded type index from {path} in: {time.time() - start_time} seconds ---")
+            return type_index
+    if graph is None:
+        return None
+    type_index = TypeIndex.from_graph(graph)
+    type_index.save(path, graph_path)
+    print(f"--- Built type index for {len(type_index)} entities in: {time.time() - start_time} seconds ---")
+    return type_index
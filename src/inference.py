@@ -0,0 +1,24 @@
+import io
+import copy
+import torch
+import torch.nn as nn
+from transformers import pipeline
+
+def configure_threads(num_threads):
+    """Pin the number of intra-op threads torch uses (0 keeps torch's default)."""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+def quantize_model(model):
+    """Copy of a CPU model whose Linear layers are dynamically quantized to int8."""
+    return torch.quantization.quantize_dynamic(copy.deepcopy(model).to('cpu'), {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def quantize_ner(ner):
+    """NER pipeline running a dynamically quantized copy of `ner`'s model."""
+    return pipeline('ner', model=quantize_model(ner.model), tokenizer=ner.tokenizer, device=-1)
+
+def model_size_mb(model):
+    """Size of the model's serialized state dict, in MB."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
@@ -0,0 +1,97 @@
+import time
+import queue
+import threading
+import numpy as np
+import torch
+
+class IntentMicroBatcher():
+    """Classifies the intents of messages from many rooms in shared batches (or one by one when not `enabled`)."""
+    def __init__(self, model, device, tags, window=0.005, max_batch_size=32, threshold=0.75, enabled=True):
+        self.model = model
+        self.device = device
+        self.tags = tags
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.threshold = threshold
+        self.enabled = enabled
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        self.largest_batch = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        if enabled:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def predict(self, X):
+        """Best tag and its probability for every row of X."""
+        with torch.inference_mode():
+            output = self.model(torch.from_numpy(X).to(self.device))
+            probs = torch.softmax(output, dim=1)
+            best_probs, predicted = torch.max(probs, dim=1)
+        return [(self.tags[idx], prob) for idx, prob in zip(predicted.tolist(), best_probs.tolist())]
+
+    def classify(self, x):
+        """(tag, prob, accepted) of one bag-of-words vector; blocks until its batch has been classified."""
+        if not self.enabled:
+            tag, prob = self.predict(x.reshape(1, -1))[0]
+            return tag, prob, prob > self.threshold
+        request = {'x': x, 'submitted': time.time(), 'done': threading.Event()}
+        self.queue.put(request)
+        request['done'].wait()
+        if 'error' in request:
+            raise request['error']
+        tag, prob = request['result']
+        return tag, prob, prob > self.threshold
+
+    def next_batch(self):
+        # wait up to window seconds after the first queued message, or until max_batch_size are queued
+        batch = [self.queue.get()]
+        deadline = batch[0]['submitted'] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            start_time = time.time()
+            try:
+                results = self.predict(np.stack([request['x'] for request in batch]))
+                for request, result in zip(batch, results):
+                    request['result'] = result
+            except Exception as e:
+                for request in batch:
+                    request['error'] = e
+            for request in batch:
+                request['done'].set()
+            self.record(batch, start_time)
+
+    def record(self, batch, start_time):
+        waits = [start_time - request['submitted'] for request in batch]
+        with self.lock:
+            self.batches += 1
+            self.messages += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.max_queue_depth = max(self.max_queue_depth, len(batch) + self.queue.qsize())
+            self.total_wait += sum(waits)
+            self.max_wait = max(self.max_wait, max(waits))
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'messages': self.messages,
+                'mean_batch_size': self.messages / self.batches if self.batches else 0.0,
+                'max_batch_size': self.largest_batch,
+                'mean_added_latency_s': self.total_wait / self.messages if self.messages else 0.0,
+                'max_added_latency_s': self.max_wait
+            }
@@ -0,0 +1,51 @@
+import os
+import time
+import threading
+from types import MappingProxyType
+from src.utils import load_json
+
+class IntentDispatcher():
+    """Maps each intent tag to its (handler, responses); tags without a handler use `default`."""
+    def __init__(self, intents_path, handlers, default, reload_freq=2.0):
+        self.intents_path = intents_path
+        self.handlers = handlers
+        self.default = default
+        self.reload_freq = reload_freq
+        self.mtime = os.stat(intents_path).st_mtime
+        self.table = self.build_table(load_json(intents_path))
+        self.running = True
+        if reload_freq:
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    def build_table(self, intents):
+        table = dict()
+        for intent in intents['intents']:
+            handler = self.handlers.get(intent['tag'], self.default)
+            table[intent['tag']] = (handler, tuple(intent['responses']))
+        return MappingProxyType(table)
+
+    def watch(self):
+        while self.running:
+            time.sleep(self.reload_freq)
+            try:
+                mtime = os.stat(self.intents_path).st_mtime
+                if mtime == self.mtime:
+                    continue
+                table = self.build_table(load_json(self.intents_path))
+            except Exception as e:
+                # keep serving the current table until the file is readable again
+                print(f"\t\t Error: failed to reload {self.intents_path}: {e}")
+                continue
+            # swapped in with one assignment, so lookup never sees a half-built table
+            self.table, self.mtime = table, mtime
+            print(f"- Reloaded {len(table)} intents from {self.intents_path}.")
+
+    def close(self):
+        self.running = False
+
+    def __contains__(self, tag):
+        return tag in self.table
+
+    def lookup(self, tag):
+        """The (handler, responses) pair of a tag (see `AnswerEngine.answer`)."""
+        return self.table[tag]
@@ -0,0 +1,155 @@
+import json
+import time
+import uuid
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class ChatServerState():
+    """In-memory rooms, messages and sessions of the local chat server."""
+    def __init__(self, bot_alias='bot', user_alias='user'):
+        self.bot_alias = bot_alias
+        self.user_alias = user_alias
+        self.sessions = dict()
+        self.rooms = dict()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.changed = threading.Condition()
+
+    def login(self, username):
+        session = uuid.uuid4().hex
+        with self.changed:
+            self.sessions[session] = username
+        return session
+
+    def logout(self, session):
+        with self.changed:
+            return self.sessions.pop(session, None) is not None
+
+    def create_room(self, duration=3600):
+        room_id = uuid.uuid4().hex[:8]
+        with self.changed:
+            self.rooms[room_id] = {'messages': list(), 'end_time': time.time() + duration}
+        return room_id
+
+    def room_list(self):
+        with self.changed:
+            return [
+                {'uid': room_id, 'alias': self.bot_alias, 'remainingTime': max(0, int((room['end_time'] - time.time()) * 1000))}
+                for room_id, room in self.rooms.items()
+            ]
+
+    def post(self, room_id, author_alias, text):
+        """Append a message to a room and return its ordinal."""
+        with self.changed:
+            messages = self.rooms[room_id]['messages']
+            ordinal = len(messages)
+            messages.append({
+                'ordinal': ordinal,
+                'authorAlias': author_alias,
+                'message': text,
+                'timeStamp': int(time.time() * 1000),
+                'received': time.time()
+            })
+            self.changed.notify_all()
+            return ordinal
+
+    def messages_since(self, room_id, since):
+        with self.changed:
+            return [
+                {key: value for key, value in message.items() if key != 'received'}
+                for message in self.rooms[room_id]['messages'][since:]
+            ]
+
+    def wait_for_reply(self, room_id, after_ordinal, timeout):
+        """Wait for the first bot message after an ordinal; returns it (with its receive time) or None."""
+        deadline = time.time() + timeout
+        with self.changed:
+            while True:
+                for message in self.rooms[room_id]['messages'][after_ordinal + 1:]:
+                    if message['authorAlias'] == self.bot_alias:
+                        return message
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+class ChatRequestHandler(BaseHTTPRequestHandler):
+    """The subset of the chat server API the bot uses."""
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def fail(self, endpoint, description, status):
+        self.state.errors[endpoint] += 1
+        self.send_json({'description': description}, status)
+
+    def session_ok(self, query):
+        return query.get('session', [None])[0] in self.state.sessions
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if parts == ['api', 'rooms']:
+            self.state.requests['rooms'] += 1
+            if not self.session_ok(query):
+                return self.fail('rooms', 'Invalid session', 401)
+            return self.send_json({'rooms': self.state.room_list()})
+        if len(parts) == 4 and parts[:2] == ['api', 'room']:
+            self.state.requests['room_state'] += 1
+            if not self.session_ok(query):
+                return self.fail('room_state', 'Invalid session', 401)
+            if parts[2] not in self.state.rooms:
+                return self.fail('room_state', 'Unknown room', 404)
+            return self.send_json({'roomId': parts[2], 'messages': self.state.messages_since(parts[2], int(parts[3]))})
+        if parts == ['api', 'logout']:
+            self.state.requests['logout'] += 1
+            if not self.state.logout(query.get('session', [None])[0]):
+                return self.fail('logout', 'Invalid session', 401)
+            return self.send_json({'description': 'Logged out'})
+        self.fail('unknown', 'Not found', 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if parts == ['api', 'login']:
+            self.state.requests['login'] += 1
+            credentials = json.loads(self.read_body() or b'{}')
+            session = self.state.login(credentials.get('username'))
+            return self.send_json({'userDetails': {'username': credentials.get('username')}, 'sessionToken': session})
+        if len(parts) == 3 and parts[:2] == ['api', 'room']:
+            self.state.requests['post_message'] += 1
+            text = self.read_body().decode('utf-8')
+            if not self.session_ok(query):
+                return self.fail('post_message', 'Invalid session', 401)
+            if parts[2] not in self.state.rooms:
+                return self.fail('post_message', 'Unknown room', 404)
+            self.state.post(parts[2], self.state.bot_alias, text)
+            return self.send_json({'description': 'Message received'})
+        self.fail('unknown', 'Not found', 404)
+
+def start_chat_server(host='127.0.0.1', port=8081, state=None):
+    """Serve the chat API from a background thread; returns (server, state)."""
+    if state is None:
+        state = ChatServerState()
+    handler = type('BoundChatRequestHandler', (ChatRequestHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"--- Local chat server listening on http://{host}:{server.server_port} ---")
+    return server, state
@@ -0,0 +1,92 @@
+import time
+import threading
+
+default_questions = [
+    "Who directed The Godfather?",
+    "When was The Matrix released?",
+    "Who is the screenwriter of 2001: A Space Odyssey?",
+    "What is the genre of Good Will Hunting?",
+    "Recommend movies similar to Hamlet and Othello.",
+    "Show me a picture of Halle Berry.",
+    "Who is the director of Star Wars: Episode VI - Return of the Jedi?",
+    "Hello!"
+]
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+class LoadGenerator():
+    """Replays question scripts in N rooms of a `ChatServerState` and measures the bot.
+
+    Every room waits for the bot's welcome message and then asks its script
+    one question at a time, waiting for the reply before asking the next.
+    `rate` is the total number of questions per second over all rooms.
+    """
+    def __init__(self, state, n_rooms=10, questions=None, rate=2.0, rounds=1, reply_timeout=60.0, room_duration=3600):
+        self.state = state
+        self.n_rooms = n_rooms
+        self.questions = questions if questions else default_questions
+        self.rate = rate
+        self.rounds = rounds
+        self.reply_timeout = reply_timeout
+        self.room_duration = room_duration
+        self.latencies = list()
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def run_room(self, room_id, offset):
+        interval = self.n_rooms / self.rate
+        if self.state.wait_for_reply(room_id, -1, self.reply_timeout) is None:
+            with self.lock:
+                self.timeouts += 1
+            return
+        time.sleep(offset)
+        script = self.questions * self.rounds
+        for idx, question in enumerate(script):
+            asked = time.time()
+            ordinal = self.state.post(room_id, self.state.user_alias, question)
+            reply = self.state.wait_for_reply(room_id, ordinal, self.reply_timeout)
+            with self.lock:
+                if reply is None:
+                    self.timeouts += 1
+                else:
+                    self.latencies.append(reply['received'] - asked)
+            if reply is None:
+                return
+            # keep the room's pace at one question per interval
+            time.sleep(max(0.0, asked + interval - time.time()))
+
+    def run(self):
+        rooms = [self.state.create_room(self.room_duration) for _ in range(self.n_rooms)]
+        print(f"--- Replaying {len(self.questions) * self.rounds} questions in {self.n_rooms} rooms at {self.rate} questions/s ---")
+        start_time = time.time()
+        threads = [
+            threading.Thread(target=self.run_room, args=(room_id, idx / self.rate), daemon=True)
+            for idx, room_id in enumerate(rooms)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.time() - start_time)
+
+    def report(self, elapsed):
+        report = {
+            'rooms': self.n_rooms,
+            'answered': len(self.latencies),
+            'timeouts': self.timeouts,
+            'server_errors': sum(self.state.errors.values()),
+            'requests': dict(self.state.requests),
+            'elapsed_s': elapsed,
+            'throughput_qps': len(self.latencies) / elapsed if elapsed > 0 else 0.0,
+            'latency_p50_s': percentile(self.latencies, 50),
+            'latency_p90_s': percentile(self.latencies, 90),
+            'latency_p99_s': percentile(self.latencies, 99),
+            'latency_max_s': max(self.latencies) if self.latencies else None
+        }
+        return report
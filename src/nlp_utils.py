@@ -1,11 +1,28 @@
 import torch
 from difflib import SequenceMatcher
 from src.training.model import NeuralNet
-from src.global_variables import special_chars, film_entities, header
-from src.utils import load_pickle, load_training_config, load_data_config
+from src.training.vectorizer import BagOfWordsVectorizer
+from src.inference import quantize_model
+from src.utils import load_pickle, load_training_config, load_data_config, load_bot_config
+from src.indexing.label_index import load_label_index
+from src.indexing.fuzzy_matcher import FuzzyMatcher
+from src.indexing.entity_matcher import EntityMatcher
+from src.indexing.type_index import load_type_index
+from src.recognizers import (
+    Recognition,
+    RecognizerCascade,
+    SpecialTitleRecognizer,
+    MiscRecognizer,
+    LinkerRecognizer,
+    TransformerRecognizer
+)
 
-def setup_answer_classifier_model():
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+def setup_answer_classifier_model(quantize=None):
+    """Load the intent classifier; with `quantize` (default: inference.quantize in
+    the bot config) its linear layers are dynamically quantized to int8, on CPU."""
+    if quantize is None:
+        quantize = load_bot_config()['inference']['quantize']
+    device = torch.device('cuda' if torch.cuda.is_available() and not quantize else 'cpu')
 
     model_file = load_training_config()['model_path']
     data = torch.load(model_file, map_location=device, weights_only=True)
@@ -14,124 +31,96 @@ def setup_answer_classifier_model():
     input_size = data["input_size"]
     hidden_size = data["hidden_size"]
     output_size = data["output_size"]
-    vocabulary = data['vocabulary']
+    # models saved before the vectorizer was stored only have the vocabulary
+    if 'vectorizer' in data:
+        vectorizer = BagOfWordsVectorizer.from_state_dict(data['vectorizer'])
+    else:
+        vectorizer = BagOfWordsVectorizer(data['vocabulary'])
     tags = data['tags']
 
     model = NeuralNet(input_size, hidden_size, output_size).to(device)
     model.load_state_dict(model_state)
     model.eval()
-    return model, device, vocabulary, tags
+    if quantize:
+        model = quantize_model(model)
+    return model, device, vectorizer, tags
 
 class EntityRecognition():
-    def __init__(self, sentence, graph, nlp, ner):
-        if sentence[-1] == '?':
-            self.sentence = sentence.split('?')[0]
-        else:
-            self.sentence = sentence
+    """Long-lived entity recognizer.
+
+    The label dictionaries are loaded once and shared (read-only) between all
+    calls, so the per-message cost only depends on the sentence itself.
+    """
+    def __init__(self, graph, nlp, ner, descriptions):
         self.graph = graph
+        self.descriptions = descriptions
         self.nlp = nlp
         self.ner = ner
         self.data_config = load_data_config()
-        self.all_movies_dict = load_pickle(self.data_config['paths_processed']['all_movies_dict'])
-        self.all_people_dict = load_pickle(self.data_config['paths_processed']['all_people_dict'])
-        self.special_movies = load_pickle(self.data_config['paths_processed']['special_movies'])
-        self.indirectSubclassOf_entities = load_pickle(self.data_config['paths_processed']['indirectSubclassOf_entities'])
-        self.movies, self.people, self.misc = self.find_entities()
-        self.linked_entities = self.map_all_entities()
-        if self.linked_entities is not None:
-            self.word_list = self.token_lem()
+        self.batch_size = load_bot_config()['spacy']['batch_size']
+        self.movie_index = load_label_index(self.data_config['paths_processed']['all_movies_dict'])
+        self.people_index = load_label_index(self.data_config['paths_processed']['all_people_dict'])
+        self.misc_index = load_label_index(self.data_config['paths_processed']['indirectSubclassOf_entities'])
+        self.all_movies_dict = self.movie_index.dictionary
+        self.all_people_dict = self.people_index.dictionary
+        self.indirectSubclassOf_entities = self.misc_index.dictionary
+        self.special_movies = tuple(load_pickle(self.data_config['paths_processed']['special_movies']))
+        self.special_matcher = FuzzyMatcher(self.special_movies)
+        self.misc_matcher = EntityMatcher(self.indirectSubclassOf_entities, word_boundary=True)
+        self.type_index = load_type_index(self.data_config['paths_processed']['entity_types'], self.data_config['paths_processed']['updated_graph'], graph)
+        self.recognizers = {
+            'special': SpecialTitleRecognizer(self.special_matcher, self.movie_index, self.descriptions.describe),
+            'misc': MiscRecognizer(self.misc_matcher, self.indirectSubclassOf_entities, self.descriptions.describe),
+            'linker': LinkerRecognizer(self.type_index, self.descriptions.describe),
+            'transformer': TransformerRecognizer(self.ner, self.movie_index, self.people_index, self.descriptions.describe)
+        }
+        self.cascade = RecognizerCascade([
+            (self.recognizers[stage['name']], stage.get('min_coverage'))
+            for stage in load_bot_config()['recognizers']
+        ])
+
+    def recognize(self, sentence, doc=None):
+        """Return the linked entities and the word list of a single sentence.
+
+        The sentence is parsed by spaCy once; the same Doc is used for entity
+        linking and lemmatisation. `doc` can be passed when it has already
+        been parsed, e.g. by `recognize_many`.
+        """
+        sentence = strip_question_mark(sentence)
+        if doc is None:
+            doc = self.nlp(sentence)
+        movies, people, misc = self.find_entities(sentence, doc)
+        linked_entities = self.map_all_entities(movies, people, misc)
+        if linked_entities is not None:
+            word_list = self.token_lem(doc, linked_entities)
         else:
-            self.word_list = [token.lemma_ for token in nlp(self.sentence) if (not token.is_punct) & (token.pos_ != 'PROPN')]
+            word_list = [token.lemma_ for token in doc if (not token.is_punct) & (token.pos_ != 'PROPN')]
             print("No entities detected.")
+        return linked_entities, word_list
 
-            
-    def find_entities(self):
+    def recognize_many(self, sentences):
+        """Return a list of (linked_entities, word_list) pairs, one per sentence."""
+        sentences = [strip_question_mark(sentence) for sentence in sentences]
+        docs = self.nlp.pipe(sentences, batch_size=self.batch_size)
+        return [self.recognize(sentence, doc) for sentence, doc in zip(sentences, docs)]
+
+    def find_entities(self, sentence, doc):
         # we only append IDs in these lists!
-        special = list()
-        movies_1, movies_2 = list(), list()
-        people_1, people_2 = list(), list()
-        misc = list()
-        # Special Movie Titles
-        # 1. check if special -> MOVIE!
-        # 2. find best match
-        is_special = False
-        for letter in self.sentence:
-            if letter in special_chars:
-                is_special = True
-        if is_special:
-            best_match_label = best_match(self.sentence, self.special_movies)
-            best_match_id = get_key_from_value(best_match_label, self.all_movies_dict)
-            special.append(best_match_id)
-            print("Special movie detected: {}, {}, {}.".format(best_match_label, best_match_id, self.get_entity_description(best_match_id)))
-        # only for indirectSubclassOf predicate
-        # look in subject dictionary
-        for misc_entity in self.indirectSubclassOf_entities.values():
-            if misc_entity in self.sentence:
-                misc_entity_id = get_key_from_value(misc_entity, self.indirectSubclassOf_entities)
-                misc.append(misc_entity_id)
-                print("Miscellaneous entity detected: {}, {}, {}.".format(misc_entity, self.get_entity_description(misc_entity_id), self.indirectSubclassOf_entities[misc_entity_id]))
-        # Normal Movie Titles/People
-        # 1. spacy NER
-        # 2. check if film/person
-        print("Checking spacy NER.")
-        entities_obj = self.nlp(self.sentence)._.linkedEntities
-        entities_1 = ['Q'+str(entity.get_id()) for entity in entities_obj]
-        entities_1_labels = [entity for entity in entities_obj]
-        for idx, entity in enumerate(entities_1):
-            if self.check_if_film(entity):
-                movies_1.append(entity)
-                print("Movie detected: {}, {}, {}.".format(entities_1_labels[idx], entity, self.get_entity_description(entity)))
-            elif self.check_if_person(entity):
-                people_1.append(entity)
-                print("Person detected: {}, {}, {}.".format(entities_1_labels[idx], entity, self.get_entity_description(entity)))
+        # exact stages (special titles, misc) are kept as they are; the movies and
+        # people of the other stages (spacy linker, transformer NER) are weighed
+        # against each other
+        exact = Recognition()
+        movie_lists, people_lists = list(), list()
+        for name, result in self.cascade.run(sentence, doc).items():
+            if self.recognizers[name].exact:
+                exact.movies.extend(result.movies)
+                exact.people.extend(result.people)
+                exact.misc.extend(result.misc)
             else:
-                print("Non-person, non-movie detected: {}, {}, {}.".format(entities_1_labels[idx], entity, self.get_entity_description(entity)))
-        # Last Resort
-        # If all of the above gives us None
-        # 1. transformer NER
-        # 2. iterate through people
-        # 3. iterate through movies
-        print("Checking huggingface NER.")
-        entities_ner = self.ner(self.sentence, aggregation_strategy="simple")
-        entities_2 = []
-        for entity in entities_ner:
-            entities_2.append(entity["word"])
-        for entity in entities_2:
-            if entity in self.all_movies_dict.values():
-                entity_key = get_key_from_value(entity, self.all_movies_dict)
-                movies_2.append(entity_key)
-                print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.get_entity_description(entity_key)))
-            elif entity in self.all_people_dict.values():
-                entity_key = get_key_from_value(entity, self.all_people_dict)
-                people_2.append(entity_key)
-                print("Person detected: {}, {}, {}.".format(entity, entity_key, self.get_entity_description(entity_key)))
-            # in case a The should've been included in the title
-            elif "The "+entity in self.all_movies_dict.values():
-                entity = "The "+entity
-                entity_key = get_key_from_value(entity, self.all_movies_dict)
-                movies_2.append(entity_key)
-                print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.get_entity_description(entity_key)))
-            # in case an unnecessary The has been included in the title
-            elif "The " in entity:
-                if entity.split("The ")[1] in self.all_movies_dict.values():
-                    entity = entity.split("The ")[1]
-                    entity_key = get_key_from_value(entity, self.all_movies_dict)
-                    movies_2.append(entity_key)
-                    print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.get_entity_description(entity_key))) 
-        # Find best option between 2 NER models
-        #special_labels = [all_movies_dict[i] for i in special]
-        movies_1_labels = [self.all_movies_dict[i] for i in movies_1]
-        movies_2_labels = [self.all_movies_dict[i] for i in movies_2]
-        movies = list()
-        if (len(movies_1) == len(movies_2)) & (len(movies_1) != 0):
-            movies_best_match = get_key_from_value(best_match(self.sentence, movies_1_labels+movies_2_labels), self.all_movies_dict)
-            movies.append(movies_best_match)
-        elif len(movies_1) > len(movies_2):
-            movies.extend(movies_1)
-        elif len(movies_1) < len(movies_2):
-            movies.extend(movies_2)
-        if len(special) > 0:
-            movies.extend(special)
+                movie_lists.append(result.movies)
+                people_lists.append(result.people)
+
+        movies = self.merge_candidates(sentence, movie_lists, self.movie_index) + exact.movies
         if len(movies)==0:
             movies = None
         if movies is not None:
@@ -139,93 +128,65 @@ class EntityRecognition():
             print("Movies detected: {}".format(movies_labels))
         else:
             print("No movies detected")
-        
-        people = list()
-        people_1_labels = [self.all_people_dict[i] for i in people_1]
-        people_2_labels = [self.all_people_dict[i] for i in people_2]
-
-        if (len(people_1) == len(people_2)) & (len(people_1) != 0):
-            people_best_match = get_key_from_value(best_match(self.sentence, people_1_labels+people_2_labels), self.all_people_dict)
-            people.append(people_best_match)
-        elif len(people_1) > len(people_2):
-            people.extend(people_1)
-        elif len(people_1) < len(people_2):
-            people.extend(people_2)
-        else: 
+
+        people = self.merge_candidates(sentence, people_lists, self.people_index) + exact.people
+        if len(people)==0:
             people = None
         if people is not None:
             people_labels = [self.all_people_dict[i] for i in people]
             print("People detected: {}".format(people_labels))
         else:
             print("No people detected.")
-        
+
+        misc = exact.misc
         if len(misc) == 0:
             misc = None
 
         return movies, people, misc
-    
 
-    def map_all_entities(self):
+    def merge_candidates(self, sentence, candidate_lists, index):
+        # Find best option between the NER models: the one that found the most
+        # entities, or the best match to the sentence if several found as many
+        longest = max((len(candidates) for candidates in candidate_lists), default=0)
+        if longest == 0:
+            return []
+        tied = [candidates for candidates in candidate_lists if len(candidates) == longest]
+        if len(tied) > 1:
+            labels = [index.dictionary[i] for candidates in tied for i in candidates]
+            return [index.get(best_match(sentence, labels))]
+        return list(tied[0])
+
+    def map_all_entities(self, movies, people, misc):
         linked_entities = dict()
-        if self.movies is not None:
-            for movie in self.movies:
+        if movies is not None:
+            for movie in movies:
                 linked_entities[movie] = self.all_movies_dict[movie]
-        if self.people is not None:
-            for people in self.people:
-                linked_entities[people] = self.all_people_dict[people]
-        if self.misc is not None:
-            for misc in self.misc:
-                linked_entities[misc] = self.indirectSubclassOf_entities[misc]
+        if people is not None:
+            for person in people:
+                linked_entities[person] = self.all_people_dict[person]
+        if misc is not None:
+            for misc_entity in misc:
+                linked_entities[misc_entity] = self.indirectSubclassOf_entities[misc_entity]
         if len(linked_entities) == 0:
             linked_entities = None
         return linked_entities
     
     def check_if_film(self, entity):
-        is_film = list()
-        for film_type in film_entities.values():
-            is_film_query = '''
-                PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-                PREFIX wd: <http://www.wikidata.org/entity/>
-    
-                ASK
-                WHERE {{wd:{} wdt:P31 wd:{} .}}
-            '''.format(entity, film_type)
-            is_film.append(list(self.graph.query(is_film_query))[0])
-        return any(is_film)
+        return self.type_index.is_film(entity)
     
     def check_if_person(self, entity):
-        is_person = False
-        is_person_query = '''
-            PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-            PREFIX wd: <http://www.wikidata.org/entity/>
-    
-            ASK
-            WHERE {{wd:{} wdt:P31 wd:Q5 .}}
-        '''.format(entity)
-        is_person = list(self.graph.query(is_person_query))[0]
-        return is_person
+        return self.type_index.is_person(entity)
     
-    def token_lem(self):
-        word_list = list()
-        for entities in list(self.linked_entities.values()):
-            word_list.extend([token.lemma_ for token in self.nlp(self.sentence) if (not token.is_punct)&(token.text not in entities)&(token.pos_!='PROPN')])
+    def token_lem(self, doc, linked_entities):
+        # a token is kept if it is not part of at least one of the entity labels
+        labels = list(linked_entities.values())
+        word_list = [token.lemma_ for token in doc if (not token.is_punct)&(token.pos_!='PROPN')&any(token.text not in entities for entities in labels)]
         return list(set(word_list))
     
-    def get_entity_description(self, entity):
-        query = header + '''    
-            SELECT ?o WHERE{{
-                wd:{} schema:description ?o .
-                }}'''.format(entity)
-        ent_descr = [row[0].toPython() for row in self.graph.query(query)] # the answer is a list of labels
-        return ent_descr
-    
-def get_key_from_value(value, dictionary):
-    try:
-        key = list(dictionary.keys())[list(dictionary.values()).index(value)]
-        return key
-    except ValueError:
-        print(f"Warning: '{value}' not found in dictionary.")
-        return None
+def strip_question_mark(sentence):
+    if sentence.endswith('?'):
+        sentence = sentence.split('?')[0]
+    return sentence
 
 def best_match(pattern, candidates):
     best_match_label = None
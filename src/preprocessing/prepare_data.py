@@ -1,7 +1,10 @@
 import pickle
 import os
+from collections import Counter, defaultdict
+from rdflib.term import Literal
 from rdflib.namespace import RDFS
 from src.question_handling.crowd_questions import Crowd_Response
+from src.indexing.type_index import TypeIndex, load_type_index, type_index_path, wd_id
 from src.utils import (
     load_data_config,
     download_file,
@@ -51,9 +54,9 @@ def download_crowd_data():
 
 # Generate movie-related predicates
 def find_movie_predicates(film_entities, graph=None):
+    data_config = load_data_config()
     if graph is None:
         graph = load_graph(data_config['paths']['graph'])
-    data_config = load_data_config()
     movie_preds = set()
     predicate_dict = {}
 
@@ -95,14 +98,12 @@ def find_movie_predicates(film_entities, graph=None):
 
 # Update predicate dictionary with crowd-sourced data
 def update_predicate_dict_with_crowd_data(graph = None):
+    data_config = load_data_config()
     if graph is None:
         graph = load_graph(data_config['paths']['graph'])
-    data_config = load_data_config()
     predicate_dict = load_pickle(data_config['paths_processed']['predicate_dict'])
     with open(data_config['paths_processed']['aggr_ans_dict'], 'rb') as handle:
         aggr_ans_dict = pickle.load(handle)
-    if graph is None:
-        graph = load_graph(data_config['paths']['graph'])
     crowd_predicates = {}
     
     for task in aggr_ans_dict['crowddata']:
@@ -146,9 +147,9 @@ def update_predicate_dict_with_crowd_data(graph = None):
 
 def generate_label_mappings(graph=None):
     """Generate entity-to-label and label-to-entity mappings from the graph."""
+    data_config = load_data_config()
     if graph is None:
         graph = load_graph(data_config['paths']['graph'])
-    data_config = load_data_config()
     try:
         ent2lbl = {ent: str(lbl) for ent, lbl in graph.subject_objects(RDFS.label)}
         lbl2ent = {lbl: ent for ent, lbl in ent2lbl.items()}
@@ -161,8 +162,51 @@ def generate_label_mappings(graph=None):
         print(f"Error generating label mappings: {e}")
         return None, None
 
-def generate_special_movies(movies):
+def generate_type_index(graph=None):
+    """Index the wdt:P31 classes of all entities (films, humans) and save it."""
+    data_config = load_data_config()
+    if graph is None:
+        graph = load_graph(data_config['paths']['graph'])
+    type_index = TypeIndex.from_graph(graph)
+    # recorded so that an index built from an older graph file is not reused
+    type_index.save(type_index_path(data_config['paths_processed']['entity_types'], data_config['paths']['graph']), data_config['paths']['graph'])
+    return type_index
+
+def generate_entity_dicts(graph=None, type_index=None):
+    """Generate the {entity ID: label} dictionaries of all movies and all people."""
+    data_config = load_data_config()
+    if graph is None:
+        graph = load_graph(data_config['paths']['graph'])
+    if type_index is None:
+        type_index = load_type_index(data_config['paths_processed']['entity_types'], data_config['paths']['graph'], graph)
+    labels = {wd_id(ent): str(lbl) for ent, lbl in graph.subject_objects(RDFS.label)}
+    all_movies_dict = {movie: labels.get(movie) for movie in type_index.films()}
+    all_people_dict = {person: labels.get(person) for person in type_index.people()}
+    save_pickle(all_movies_dict, data_config['paths_processed']['all_movies_dict'])
+    save_pickle(all_people_dict, data_config['paths_processed']['all_people_dict'])
+
+def generate_relation_ranges(graph=None, type_index=None):
+    """Find the usual object type ('film', 'person', 'other' or 'literal') of every predicate."""
+    data_config = load_data_config()
+    if graph is None:
+        graph = load_graph(data_config['paths']['graph'])
+    if type_index is None:
+        type_index = load_type_index(data_config['paths_processed']['entity_types'], data_config['paths']['graph'], graph)
+    kind_counts = defaultdict(Counter)
+    for _, pred, obj in graph:
+        if isinstance(obj, Literal):
+            kind_counts[str(pred)]['literal'] += 1
+        else:
+            kind_counts[str(pred)][type_index.kind(wd_id(obj))] += 1
+    relation_ranges = {pred: counts.most_common(1)[0][0] for pred, counts in kind_counts.items()}
+    save_pickle(relation_ranges, data_config['paths_processed']['relation_ranges'])
+    return relation_ranges
+
+def generate_special_movies(movies=None):
+    """Save the movie titles with special characters, by default those of the movie dictionary."""
     data_config = load_data_config()
+    if movies is None:
+        movies = [label for label in load_pickle(data_config['paths_processed']['all_movies_dict']).values() if label is not None]
     special_movies = [movie for movie in movies if any(char in movie for char in special_chars)]
     save_pickle(special_movies, data_config['paths_processed']['special_movies'])
 
@@ -183,5 +227,9 @@ def prepare_data():
     # update_predicate_dict_with_crowd_data(graph) # TODO: not working yet
     # Generate entity-to-label and label-to-entity mappings
     generate_label_mappings(graph)
-    # Generate special movies
-    # generate_special_movies() TODO: not working properly, need to pass movies list
+    # Generate the entity type index and the movie/people dictionaries
+    type_index = generate_type_index(graph)
+    generate_entity_dicts(graph, type_index)
+    generate_relation_ranges(graph, type_index)
+    # Generate special movies from the movie dictionary
+    generate_special_movies()
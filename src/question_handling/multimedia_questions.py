@@ -7,82 +7,55 @@ Created on Fri Dec  9 14:58:24 2022
 import random
 
 class Multimedia_Response():
-    
-    def __init__(self, graph, linked_entities, image_data):
+    def __init__(self, graph, image_index, descriptions):
         self.graph = graph
-        self.linked_entities = linked_entities
-        self.image_data = image_data
-        self.person = self.filter_entities()
+        self.descriptions = descriptions
+        self.image_index = image_index
 
-    def get_imdb_id(self, entity):
-        query = '''
-                PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-                PREFIX wd: <http://www.wikidata.org/entity/>
-    
-                SELECT (str(?imdb) as ?string) WHERE {{
-                wd:{} wdt:P345 ?imdb .
-                }}
-                '''.format(entity)
-        imdb_id = [row[0].toPython() for row in self.graph.query(query)]
-        return imdb_id
-    
-    def filter_entities(self):
+    def filter_entities(self, linked_entities):
         person = dict()
-        check_entities = self.linked_entities.copy()
-        for (entity, label) in check_entities.items():
-            descr = self.get_entity_description(entity)
+        for (entity, label) in linked_entities.items():
+            descr = self.descriptions.describe(entity)
             print(f"Person detected: {label}, {entity}, {descr}.")
             person[entity] = label
         if len(person) > 1:
             print("More than one people detected.")
-            return None, None
+            person = None
         elif len(person) == 0:
             person = None
             print("No people detected.")
         return person
         
-    def get_entity_description(self, entity):
-        query = '''
-            PREFIX schema: <http://schema.org/>
-            PREFIX wd: <http://www.wikidata.org/entity/>
-    
-            SELECT ?o WHERE{{
-                wd:{} schema:description ?o .
-                }}'''.format(entity)
-        ent_descr = [row[0].toPython() for row in self.graph.query(query)] # the answer is a list of labels
-        return ent_descr 
-    
-    def person_lookup(self):
-        person_imdb = self.get_imdb_id(list(self.person.keys())[0])
-        candidate_images = list()
-        for elem in self.image_data:
-            if (elem['cast'] == person_imdb) & (elem['type'] == 'poster'):
-                candidate_images.append(elem['img'])
+    def person_lookup(self, person):
+        # images showing only this person (their cast is exactly the person's IMDb IDs)
+        entity = list(person.keys())[0]
+        candidate_images = self.image_index.solo_images(entity, 'poster')
         # going for any image in case there are no posters
         if not candidate_images:
-            for elem in self.image_data:
-                if (elem['cast'] == person_imdb):
-                    candidate_images.append(elem['img'])
+            candidate_images = self.image_index.solo_images(entity)
             # if we still cannot find any images, they don't exist
             if not candidate_images:
-                image = None
                 print("No available images")
-            else:
-                image = random.choice(candidate_images)
-        else:
-            image = random.choice(candidate_images)
-        return image
+        return candidate_images
     
-    def get_image(self):
-        if self.person is not None:
-            return self.person_lookup()
+    def get_images(self, person):
+        if person is not None:
+            return self.person_lookup(person)
         else:
-            return None            
+            return list()
+    
+    def select(self, tag, linked_entities, sentence):
+        # the images only depend on the linked person
+        return (tag, tuple(linked_entities.items()))
+    
+    def compute(self, request):
+        _, linked_entities = request
+        person = self.filter_entities(dict(linked_entities))
+        return self.get_images(person)
         
-    def build_response(self):
-        response = self.get_image()
-        if response is not None:
-            response = response.replace(".jpg", "")
+    def render(self, payload, intent_responses):
+        if payload:
+            response = random.choice(payload).replace(".jpg", "")
             return f"image:{response}"
         else:
-            return "Could not find any images that correspond to your request. Do you want me to look for something else?"
\ No newline at end of file
+            return "Could not find any images that correspond to your request. Do you want me to look for something else?"
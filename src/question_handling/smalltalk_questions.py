@@ -0,0 +1,12 @@
+import random
+
+class Smalltalk_Response():
+    """Greetings and goodbyes: one of the intent's responses, nothing to look up."""
+    def select(self, tag, linked_entities, sentence):
+        return None
+    
+    def compute(self, request):
+        return None
+    
+    def render(self, payload, intent_responses):
+        return random.choice(intent_responses)
@@ -0,0 +1,203 @@
+import re
+import threading
+from collections import OrderedDict
+from src.global_variables import special_chars
+
+class Recognition():
+    """Entity IDs found by one recognizer, and the text spans they cover."""
+    def __init__(self, movies=None, people=None, misc=None, spans=None):
+        self.movies = list(movies or [])
+        self.people = list(people or [])
+        self.misc = list(misc or [])
+        self.spans = list(spans or [])
+
+    def __len__(self):
+        return len(self.movies) + len(self.people) + len(self.misc)
+
+class SpecialTitleRecognizer():
+    """Titles with special characters, fuzzy-matched against the special movies.
+
+    Its movies are taken as they are (`exact`), not weighed against the other
+    recognizers' movies.
+    """
+    name = 'special'
+    exact = True
+
+    def __init__(self, special_matcher, movie_index, describe):
+        self.special_matcher = special_matcher
+        self.movie_index = movie_index
+        self.describe = describe
+
+    def recognize(self, sentence, doc):
+        if not any(letter in special_chars for letter in sentence):
+            return Recognition()
+        best_match_label = self.special_matcher.best_match(sentence)
+        best_match_id = self.movie_index.get(best_match_label)
+        if best_match_id is None:
+            # a special title that is not (or no longer) in the movie dictionary
+            return Recognition()
+        print("Special movie detected: {}, {}, {}.".format(best_match_label, best_match_id, self.describe(best_match_id)))
+        return Recognition(movies=[best_match_id], spans=[best_match_label])
+
+class MiscRecognizer():
+    """Labels of the indirectSubclassOf entities (genres etc.) found in the sentence."""
+    name = 'misc'
+    exact = True
+
+    def __init__(self, misc_matcher, misc_dict, describe):
+        self.misc_matcher = misc_matcher
+        self.misc_dict = misc_dict
+        self.describe = describe
+
+    def recognize(self, sentence, doc):
+        result = Recognition()
+        for misc_entity, misc_entity_id in self.misc_matcher.find(sentence):
+            result.misc.append(misc_entity_id)
+            result.spans.append(misc_entity)
+            print("Miscellaneous entity detected: {}, {}, {}.".format(misc_entity, self.describe(misc_entity_id), self.misc_dict[misc_entity_id]))
+        return result
+
+class LinkerRecognizer():
+    """Entities linked by spaCy's entityLinker component, kept if they are films or people."""
+    name = 'linker'
+    exact = False
+
+    def __init__(self, type_index, describe):
+        self.type_index = type_index
+        self.describe = describe
+
+    def recognize(self, sentence, doc):
+        print("Checking spacy NER.")
+        result = Recognition()
+        for linked_entity in doc._.linkedEntities:
+            entity = 'Q'+str(linked_entity.get_id())
+            if self.type_index.is_film(entity):
+                result.movies.append(entity)
+                print("Movie detected: {}, {}, {}.".format(linked_entity, entity, self.describe(entity)))
+            elif self.type_index.is_person(entity):
+                result.people.append(entity)
+                print("Person detected: {}, {}, {}.".format(linked_entity, entity, self.describe(entity)))
+            else:
+                print("Non-person, non-movie detected: {}, {}, {}.".format(linked_entity, entity, self.describe(entity)))
+                continue
+            result.spans.append(linked_entity.get_span().text)
+        return result
+
+class TransformerRecognizer():
+    """Entities of the HuggingFace NER pipeline, looked up in the movie and people labels."""
+    name = 'transformer'
+    exact = False
+
+    def __init__(self, ner, movie_index, people_index, describe):
+        self.ner = ner
+        self.movie_index = movie_index
+        self.people_index = people_index
+        self.describe = describe
+
+    def recognize(self, sentence, doc):
+        print("Checking huggingface NER.")
+        result = Recognition()
+        for entity in [entity["word"] for entity in self.ner(sentence, aggregation_strategy="simple")]:
+            span = entity
+            if entity in self.movie_index:
+                entity_key = self.movie_index.get(entity)
+                result.movies.append(entity_key)
+                print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.describe(entity_key)))
+            elif entity in self.people_index:
+                entity_key = self.people_index.get(entity)
+                result.people.append(entity_key)
+                print("Person detected: {}, {}, {}.".format(entity, entity_key, self.describe(entity_key)))
+            # in case a The should've been included in the title
+            elif "The "+entity in self.movie_index:
+                entity = "The "+entity
+                entity_key = self.movie_index.get(entity)
+                result.movies.append(entity_key)
+                print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.describe(entity_key)))
+            # in case an unnecessary The has been included in the title
+            elif ("The " in entity) and (entity.split("The ")[1] in self.movie_index):
+                entity = entity.split("The ")[1]
+                entity_key = self.movie_index.get(entity)
+                result.movies.append(entity_key)
+                print("Movie detected: {}, {}, {}.".format(entity, entity_key, self.describe(entity_key)))
+            # in case of different casing or punctuation, e.g. "the lord of the rings"
+            elif self.movie_index.find(entity):
+                entity_key = self.movie_index.find(entity)[0]
+                result.movies.append(entity_key)
+                print("Movie detected: {}, {}, {}.".format(self.movie_index.dictionary[entity_key], entity_key, self.describe(entity_key)))
+            elif self.people_index.find(entity):
+                entity_key = self.people_index.find(entity)[0]
+                result.people.append(entity_key)
+                print("Person detected: {}, {}, {}.".format(self.people_index.dictionary[entity_key], entity_key, self.describe(entity_key)))
+            else:
+                continue
+            result.spans.append(span)
+        return result
+
+class StubRecognizer():
+    """Recognizer with canned answers (sentence -> Recognition), for running the cascade offline."""
+    def __init__(self, name, answers, exact=False):
+        self.name = name
+        self.answers = answers
+        self.exact = exact
+
+    def recognize(self, sentence, doc):
+        return self.answers.get(sentence, Recognition())
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+def proper_nouns(doc):
+    return [token.text for token in doc if token.pos_ == 'PROPN'] if doc is not None else []
+
+class RecognizerCascade():
+    """Runs recognizers in order and skips the expensive ones when they are not needed.
+
+    `stages` is a list of (recognizer, min_coverage) in running order. A stage
+    with a `min_coverage` only runs while less than that share of the
+    sentence's proper nouns is covered by the spans the earlier stages
+    resolved (so 1.0 means: run while any proper noun is unresolved); a
+    stage without one always runs. `stats` counts, per stage, how often it
+    ran, was skipped, and found at least one entity.
+    """
+    def __init__(self, stages):
+        self.stages = stages
+        self.counts = OrderedDict((recognizer.name, {'runs': 0, 'skipped': 0, 'hits': 0}) for recognizer, _ in stages)
+        self.lock = threading.Lock()
+
+    def coverage(self, nouns, spans):
+        if not nouns:
+            return 1.0
+        # whole words only: 'Ann' is not resolved by a 'Joanna' span
+        span_words = [set(words(span)) for span in spans]
+        resolved = [noun for noun in nouns if words(noun) and any(set(words(noun)) <= span for span in span_words)]
+        return len(resolved) / len(nouns)
+
+    def run(self, sentence, doc):
+        """Return an OrderedDict of stage name -> Recognition for the stages that ran."""
+        nouns = proper_nouns(doc)
+        spans = list()
+        results = OrderedDict()
+        for recognizer, min_coverage in self.stages:
+            counts = self.counts[recognizer.name]
+            if min_coverage is not None and self.coverage(nouns, spans) >= min_coverage:
+                with self.lock:
+                    counts['skipped'] += 1
+                continue
+            result = recognizer.recognize(sentence, doc)
+            with self.lock:
+                counts['runs'] += 1
+                if len(result) > 0:
+                    counts['hits'] += 1
+            spans.extend(result.spans)
+            results[recognizer.name] = result
+        return results
+
+    def stats(self):
+        stats = OrderedDict()
+        with self.lock:
+            counts_copy = [(name, dict(counts)) for name, counts in self.counts.items()]
+        for name, counts in counts_copy:
+            calls = counts['runs'] + counts['skipped']
+            stats[name] = dict(counts, hit_rate=counts['hits'] / counts['runs'] if counts['runs'] else 0.0,
+                               skip_rate=counts['skipped'] / calls if calls else 0.0)
+        return stats
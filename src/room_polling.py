@@ -0,0 +1,49 @@
+class RoomSchedule():
+    """Per-room message cursor and adaptive poll interval.
+
+    Each room remembers the last message ordinal it has seen, which is passed
+    as `since` so a poll only downloads the messages from there on; until a
+    first message has been seen there is no cursor and the whole room is
+    fetched. A room is polled every `min_interval` seconds while its
+    conversation is active; each poll without new messages multiplies its
+    interval by `backoff_factor`, up to `max_interval`.
+    """
+    def __init__(self, min_interval=0.5, max_interval=8.0, backoff_factor=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.rooms = dict()
+
+    def room(self, room_id):
+        if room_id not in self.rooms:
+            self.rooms[room_id] = {'since': None, 'interval': self.min_interval, 'next_poll': 0.0}
+        return self.rooms[room_id]
+
+    def is_due(self, room_id, now):
+        return self.room(room_id)['next_poll'] <= now
+
+    def since(self, room_id):
+        since = self.room(room_id)['since']
+        return 0 if since is None else since
+
+    def update(self, room_id, messages, now):
+        """Advance the room's cursor past the polled messages and schedule its next poll."""
+        room = self.room(room_id)
+        last_ordinal = max((message['ordinal'] for message in messages), default=None)
+        if last_ordinal is not None and (room['since'] is None or last_ordinal > room['since']):
+            room['since'] = last_ordinal
+            room['interval'] = self.min_interval
+        else:
+            room['interval'] = min(room['interval'] * self.backoff_factor, self.max_interval)
+        room['next_poll'] = now + room['interval']
+
+    def remove(self, room_id):
+        """Forget a finished room."""
+        self.rooms.pop(room_id, None)
+
+    def sleep_time(self, now):
+        """Seconds until the next room is due, at most `min_interval`."""
+        if not self.rooms:
+            return self.min_interval
+        next_poll = min(room['next_poll'] for room in self.rooms.values())
+        return min(max(next_poll - now, 0.0), self.min_interval)
@@ -11,26 +11,12 @@ from torch.utils.data import DataLoader
 from src.training.model import NeuralNet
 from src.utils import load_json, load_training_config, load_resources
 from src.training.training_dataset import process_intents, ChatDataset
+from src.training.vectorizer import BagOfWordsVectorizer
 
-def bag_of_words(vocabulary, sentence):
-    bag = np.zeros(len(vocabulary), dtype=np.float32)
-    for word in vocabulary:
-        if word in sentence:
-            idx = vocabulary.index(word)
-            bag[idx] += 1
-    return bag
-
-def prepare_training_data(vocabulary, documents, classes, batch_size):
-    Xtrain = list()
-    ytrain = list()
-    for document in documents:
-        bag = bag_of_words(vocabulary, document[0])
-        Xtrain.append(bag)
-        tag = document[1]
-        ytrain.append(classes.index(tag))
-        
-    Xtrain = np.array(Xtrain)
-    ytrain = np.array(ytrain)
+def prepare_training_data(vectorizer, documents, classes, batch_size):
+    Xtrain = vectorizer.transform_batch([document[0] for document in documents])
+    class2idx = {tag: idx for idx, tag in enumerate(classes)}
+    ytrain = np.array([class2idx[document[1]] for document in documents])
     dataset = ChatDataset(Xtrain, ytrain)
     train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True, num_workers=0)
     
@@ -38,7 +24,7 @@ def prepare_training_data(vocabulary, documents, classes, batch_size):
 
 def train_model(
     input_size, hidden_size,
-    output_size, vocabulary,
+    output_size, vectorizer,
     documents, classes,
     learning_rate, num_epochs,
     batch_size
@@ -50,7 +36,7 @@ def train_model(
     criterion = nn.CrossEntropyLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
 
-    train_loader = prepare_training_data(vocabulary, documents, classes, batch_size)
+    train_loader = prepare_training_data(vectorizer, documents, classes, batch_size)
 
     for epoch in range(num_epochs):
         for (words, labels) in train_loader:
@@ -76,6 +62,7 @@ def main():
     intents = load_json('./data/intents.json')
     nlp = load_resources(nlp_only=True)
     vocabulary, documents, classes = process_intents(intents, nlp)
+    vectorizer = BagOfWordsVectorizer(vocabulary)
     
     # Hyper-parameters: load from config
     input_size = len(vocabulary)
@@ -89,7 +76,7 @@ def main():
 
     trained_model = train_model(
         input_size, hidden_size,
-        output_size, vocabulary,
+        output_size, vectorizer,
         documents, classes,
         learning_rate, num_epochs,
         batch_size
@@ -100,6 +87,7 @@ def main():
     "hidden_size": hidden_size,
     "output_size": output_size,
     "vocabulary": vocabulary,
+    "vectorizer": vectorizer.state_dict(),
     "tags": classes
     }
 
@@ -6,13 +6,16 @@ def process_intents(intents, nlp):
     vocabulary = []
     documents = []
     classes = []
-    for intent in intents['intents']:
-        for pattern in intent['patterns']:
-            word_list = [token.lemma_ for token in nlp(pattern) if not token.is_punct]
+    patterns = [(pattern, intent['tag']) for intent in intents['intents'] for pattern in intent['patterns']]
+    # only the lemmas are needed: skip the parser and the entity linker
+    with nlp.select_pipes(disable=[name for name in ('parser', 'entityLinker') if name in nlp.pipe_names]):
+        docs = nlp.pipe([pattern for pattern, _ in patterns])
+        for doc, (_, tag) in zip(docs, patterns):
+            word_list = [token.lemma_ for token in doc if not token.is_punct]
             vocabulary.extend(word_list)
-            documents.append((word_list, intent['tag']))
-            if intent['tag'] not in classes:
-                classes.append(intent['tag'])
+            documents.append((word_list, tag))
+            if tag not in classes:
+                classes.append(tag)
 
     vocabulary = sorted(set(vocabulary))
     random.shuffle(documents)
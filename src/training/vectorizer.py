@@ -0,0 +1,61 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+class BagOfWordsVectorizer():
+    """Bag-of-words features over a fixed vocabulary.
+
+    A word of the sentence that is in the vocabulary sets the entry of its
+    first vocabulary position to the number of times it occurs in the
+    vocabulary (1 for the deduplicated vocabularies built by
+    `process_intents`), however often it occurs in the sentence. Words are
+    looked up in a dictionary, so a sentence costs O(len(sentence)) instead
+    of O(V^2).
+    """
+    def __init__(self, vocabulary):
+        self.size = len(vocabulary)
+        self.word2idx = dict()
+        self.counts = dict()
+        for idx, word in enumerate(vocabulary):
+            self.word2idx.setdefault(word, idx)
+            self.counts[word] = self.counts.get(word, 0) + 1
+
+    def state_dict(self):
+        return {'size': self.size, 'word2idx': self.word2idx, 'counts': self.counts}
+
+    @classmethod
+    def from_state_dict(cls, state):
+        vectorizer = cls([])
+        vectorizer.size = state['size']
+        vectorizer.word2idx = state['word2idx']
+        vectorizer.counts = state['counts']
+        return vectorizer
+
+    def transform_sparse(self, sentence):
+        """Column indices (sorted) and values of the sentence's non-zero entries."""
+        words = sorted({word for word in sentence if word in self.word2idx}, key=self.word2idx.get)
+        indices = np.array([self.word2idx[word] for word in words], dtype=np.int64)
+        values = np.array([self.counts[word] for word in words], dtype=np.float32)
+        return indices, values
+
+    def transform(self, sentence):
+        bag = np.zeros(self.size, dtype=np.float32)
+        indices, values = self.transform_sparse(sentence)
+        bag[indices] = values
+        return bag
+
+    def transform_batch(self, sentences, sparse=False):
+        """One row per sentence, as a dense array or a scipy CSR matrix."""
+        indptr = [0]
+        indices = list()
+        values = list()
+        for sentence in sentences:
+            row_indices, row_values = self.transform_sparse(sentence)
+            indices.append(row_indices)
+            values.append(row_values)
+            indptr.append(indptr[-1] + len(row_indices))
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+        matrix = csr_matrix((values, indices, np.array(indptr)), shape=(len(indptr) - 1, self.size), dtype=np.float32)
+        if sparse:
+            return matrix
+        return matrix.toarray()
@@ -4,7 +4,6 @@ Created on Wed Dec 14 17:45:08 2022
 
 @author: Nadia Timoleon
 """
-import csv
 import os
 import pickle
 import rdflib
@@ -14,9 +13,10 @@ import yaml
 import spacy
 import zipfile
 import urllib.request
-import numpy as np
 from transformers import pipeline
 from tqdm import tqdm
+from src.indexing.triple_store import TripleStore, snapshot_path, is_snapshot_valid
+from src.inference import quantize_ner
 
 # Utility function to download files, with progress bar
 def download_file(url, destination):
@@ -44,16 +44,25 @@ def unzip_file(zip_file, destination_dir):
     # Optionally delete the zip file
     os.remove(zip_file)
 
-def load_resources(nlp_only=False):
-    """Load all models and dictionaries.""" 
+def load_resources(nlp_only=False, quantize=None):
+    """Load all models and dictionaries.
+
+    With `quantize` (default: inference.quantize in the bot config) the NER
+    model's linear layers are dynamically quantized to int8 for CPU inference.
+    """
     # Load the Spacy model and add the entity linker
-    nlp = spacy.load("en_core_web_md")
+    # (components that no call uses, e.g. spaCy's own NER, are not loaded)
+    nlp = spacy.load("en_core_web_md", exclude=load_bot_config()['spacy']['exclude'])
     nlp.add_pipe("entityLinker", last=True)
     # Specify the exact model and revision for the NER pipeline
     model_name = "dbmdz/bert-large-cased-finetuned-conll03-english"
     revision = "f2482bf"
     # Create the NER pipeline with the specified model and revision
     ner = pipeline('ner', model=model_name, revision=revision)
+    if quantize is None:
+        quantize = load_bot_config()['inference']['quantize']
+    if quantize:
+        ner = quantize_ner(ner)
     
     if nlp_only:
         return nlp
@@ -61,44 +70,39 @@ def load_resources(nlp_only=False):
         return nlp, ner
 
 # KNOWLEDGE GRAPH LOADING
-def load_graph(graph_path, format='turtle'):
-    """Load an RDF graph from a file."""
+def load_graph(graph_path, format='turtle', backend='rdflib'):
+    """Load an RDF graph from a file, as an rdflib graph or as a `TripleStore`.
+
+    The `TripleStore` is read from its binary snapshot next to the graph file
+    when that snapshot is up to date; otherwise the file is parsed and the
+    snapshot (re)written for the next start.
+    """
     try:
         start_time = time.time()
-        print(f"--- Loading graph from {graph_path} ---")
-        graph = rdflib.Graph().parse(graph_path, format=format)
+        if backend != 'triple_store':
+            print(f"--- Parsing graph from {graph_path} with rdflib ---")
+            graph = rdflib.Graph().parse(graph_path, format=format)
+            print(f"--- Loaded graph in: {time.time() - start_time} seconds ---")
+            return graph
+        snapshot = snapshot_path(graph_path)
+        if is_snapshot_valid(snapshot, graph_path):
+            graph = TripleStore.load(snapshot)
+            print(f"--- Loaded graph snapshot {snapshot} ({len(graph)} triples) in: {time.time() - start_time} seconds ---")
+            return graph
+        print(f"--- No valid snapshot found; parsing graph from {graph_path} ---")
+        graph = TripleStore.from_file(graph_path, format=format)
+        print(f"--- Parsed graph ({len(graph)} triples) in: {time.time() - start_time} seconds ---")
+        try:
+            graph.save(snapshot, source_path=graph_path)
+            print(f"--- Wrote graph snapshot {snapshot} ---")
+        except OSError as e:
+            print(f"Error writing graph snapshot: {e}")
         print(f"--- Loaded graph in: {time.time() - start_time} seconds ---")
         return graph
     except Exception as e:
         print(f"Error loading graph: {e}")
         return None
 
-# EMBEDDING LOADING
-def load_embeddings():
-    """Load entity and relation embeddings along with their mappings."""
-    data_config = load_data_config()
-    entity_emb_path = data_config['paths_embeddings']['entity_emb']
-    relation_emb_path = data_config['paths_embeddings']['relation_emb']
-    entity_file = data_config['paths_embeddings']['entity_file']
-    relation_file = data_config['paths_embeddings']['relation_file']
-    try:
-        entity_emb = np.load(entity_emb_path)
-        relation_emb = np.load(relation_emb_path)
-
-        with open(entity_file, 'r') as f:
-            ent2id = {rdflib.term.URIRef(ent): int(idx) for idx, ent in csv.reader(f, delimiter='\t')}
-            id2ent = {v: k for k, v in ent2id.items()}
-
-        with open(relation_file, 'r') as f:
-            rel2id = {rdflib.term.URIRef(rel): int(idx) for idx, rel in csv.reader(f, delimiter='\t')}
-            id2rel = {v: k for k, v in rel2id.items()}
-
-        return entity_emb, relation_emb, ent2id, id2ent, rel2id, id2rel
-
-    except Exception as e:
-        print(f"Error loading embeddings: {e}")
-        return None, None, None, None, None, None
-
 # CONFIGURATION LOADING
 def load_data_config():
     """Load configuration data from a YAML file."""
@@ -119,6 +123,16 @@ def load_training_config():
         print(f"Error loading training configuration: {e}")
         return None
     
+# BOT CONFIG
+def load_bot_config():
+    """Load the bot runtime configuration from a YAML file."""
+    try:
+        with open('config/bot_config.yaml', 'r') as f:
+            return yaml.safe_load(f)
+    except Exception as e:
+        print(f"Error loading bot configuration: {e}")
+        return None
+    
 # CREDENTIALS LOADING
 def load_credentials():
     """Load credentials from a YAML file."""
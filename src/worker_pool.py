@@ -0,0 +1,218 @@
+import time
+import queue
+import threading
+import traceback
+import multiprocessing as mp
+from collections import OrderedDict, deque
+
+fallback_response = "Sorry, could you rephrase your message?"
+
+def worker_main(worker_id, generation, task_queue, result_queue):
+    """Worker process: load the resources once, then answer questions until told to stop."""
+    # imported here so that only the workers load the models
+    from src.answer_engine import AnswerEngine, reload_if_changed
+    from src.utils import load_bot_config
+    reload_freq = load_bot_config()['data']['reload_freq']
+    engine = AnswerEngine(f"worker-{worker_id}")
+    try:
+        engine.setup()
+    except Exception as e:
+        # reported to the pool, which restarts the worker with a backoff (or gives up on it)
+        traceback.print_exc()
+        result_queue.put(('failed', worker_id, generation, None, None, f"{type(e).__name__}: {e}"))
+        return
+    result_queue.put(('ready', worker_id, generation, None, None, None))
+    next_reload_check = time.time() + reload_freq
+    while True:
+        # between questions, load the data again if its files have changed
+        if reload_freq and time.time() >= next_reload_check:
+            engine = reload_if_changed(engine)
+            next_reload_check = time.time() + reload_freq
+        try:
+            task = task_queue.get(timeout=reload_freq or None)
+        except queue.Empty:
+            continue
+        if task is None:
+            break
+        room_id, ordinal, message = task
+        try:
+            response = engine.get_response(message)
+        except Exception as e:
+            print(f"\t\t Error: worker {worker_id} failed to answer '{message}': {e}")
+            response = fallback_response
+        result_queue.put(('reply', worker_id, generation, room_id, ordinal, response))
+
+class AnswerWorkerPool():
+    """Answers questions in N worker processes, each with its own copy of the models.
+
+    `submit` queues a question; `on_reply(room_id, ordinal, response)` is
+    called from the pool's result thread once it is answered. A room has at
+    most one question in flight, so replies come back in the order the
+    questions were asked. Dead workers are restarted and their question is
+    retried, up to `max_retries` times before the fallback answer is sent.
+
+    A worker that dies before it is ready (e.g. its `setup` fails) is
+    restarted after `restart_backoff` seconds, doubling with every failed
+    start, and given up on after `max_restarts` of them. Once every worker
+    has been given up on, the pool stops and passes the unanswered questions
+    to `on_failure(tasks)`, which answers them (and all later ones) some
+    other way; without it they get the fallback answer.
+    """
+    def __init__(self, n_workers, on_reply, max_retries=2, check_freq=1.0, max_restarts=3, restart_backoff=5.0, on_failure=None):
+        self.on_reply = on_reply
+        self.on_failure = on_failure
+        self.max_retries = max_retries
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.check_freq = check_freq
+        self.context = mp.get_context('spawn')
+        self.result_queue = self.context.Queue()
+        self.workers = dict()
+        self.pending = OrderedDict()
+        self.busy_rooms = set()
+        self.lock = threading.Lock()
+        self.running = True
+        for worker_id in range(n_workers):
+            self.start_worker(worker_id)
+        threading.Thread(target=self.collect_results, daemon=True).start()
+        threading.Thread(target=self.monitor, daemon=True).start()
+
+    def start_worker(self, worker_id, restarts=0):
+        generation = self.workers[worker_id]['generation'] + 1 if worker_id in self.workers else 0
+        task_queue = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main, args=(worker_id, generation, task_queue, self.result_queue), daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = {
+            'process': process,
+            'tasks': task_queue,
+            'generation': generation,
+            'ready': False,
+            'task': None,
+            'restarts': restarts,  # failed starts in a row
+            'restart_at': None,
+            'given_up': False
+        }
+
+    def submit(self, room_id, ordinal, message):
+        with self.lock:
+            if self.running:
+                self.pending.setdefault(room_id, deque()).append((room_id, ordinal, message, 0))
+                self.dispatch()
+                return
+        # every worker has been given up on
+        self.hand_over([(room_id, ordinal, message)])
+
+    def hand_over(self, tasks):
+        """Answer questions the workers never will: through `on_failure`, or with the fallback answer."""
+        if self.on_failure is not None:
+            try:
+                self.on_failure(tasks)
+                return
+            except Exception as e:
+                print(f"\t\t Error: could not answer without the workers either: {e}")
+                self.on_failure = None
+        for room_id, ordinal, _ in tasks:
+            self.on_reply(room_id, ordinal, fallback_response)
+
+    def dispatch(self):
+        """Hand the next question of every idle room to an idle worker. Call with the lock held."""
+        idle = [worker for worker in self.workers.values() if worker['ready'] and worker['task'] is None]
+        for room_id in list(self.pending):
+            if not idle:
+                break
+            if room_id in self.busy_rooms:
+                continue
+            task = self.pending[room_id].popleft()
+            if not self.pending[room_id]:
+                del self.pending[room_id]
+            worker = idle.pop()
+            worker['task'] = task
+            self.busy_rooms.add(room_id)
+            worker['tasks'].put(task[:3])
+
+    def collect_results(self):
+        while self.running:
+            kind, worker_id, generation, room_id, ordinal, response = self.result_queue.get()
+            with self.lock:
+                worker = self.workers[worker_id]
+                if generation != worker['generation']:
+                    continue  # from a worker that has been replaced since
+                if kind == 'ready':
+                    print(f"- Answer worker {worker_id} is ready.")
+                    worker['ready'] = True
+                    worker['restarts'] = 0
+                elif kind == 'failed':
+                    # the process exits right after; the monitor restarts it
+                    print(f"\t\t Error: answer worker {worker_id} failed to load: {response}")
+                    continue
+                else:
+                    worker['task'] = None
+                    self.busy_rooms.discard(room_id)
+                self.dispatch()
+            if kind == 'reply':
+                self.on_reply(room_id, ordinal, response)
+
+    def monitor(self):
+        while self.running:
+            time.sleep(self.check_freq)
+            failed = list()
+            unanswered = None
+            with self.lock:
+                now = time.time()
+                for worker_id, worker in list(self.workers.items()):
+                    if worker['given_up'] or worker['process'].is_alive():
+                        continue
+                    if worker['restart_at'] is None:
+                        failed.extend(self.worker_died(worker_id, worker, now))
+                    if not worker['given_up'] and now >= worker['restart_at']:
+                        self.start_worker(worker_id, worker['restarts'])
+                if all(worker['given_up'] for worker in self.workers.values()):
+                    self.running = False
+                    unanswered = [task[:3] for tasks in self.pending.values() for task in tasks]
+                    self.pending.clear()
+                    self.busy_rooms.clear()
+                else:
+                    self.dispatch()
+            for room_id, ordinal in failed:
+                self.on_reply(room_id, ordinal, fallback_response)
+            if unanswered is not None:
+                print("\t\t Error: none of the answer workers could be started; stopping the worker pool.")
+                self.hand_over(unanswered)
+
+    def worker_died(self, worker_id, worker, now):
+        """Schedule the restart of a dead worker and requeue its question. Call with the lock held.
+
+        Returns the (room_id, ordinal) of a question that has run out of retries.
+        """
+        failed = list()
+        if not worker['ready']:
+            worker['restarts'] += 1
+        worker['ready'] = False
+        if worker['restarts'] > self.max_restarts:
+            print(f"\t\t Error: answer worker {worker_id} failed to start {worker['restarts']} times; giving up on it.")
+            worker['given_up'] = True
+        else:
+            delay = self.restart_backoff * 2 ** (worker['restarts'] - 1) if worker['restarts'] else 0.0
+            print(f"\t\t Error: answer worker {worker_id} died (exit code {worker['process'].exitcode}); restarting it in {delay:.0f} s.")
+            worker['restart_at'] = now + delay
+        task, worker['task'] = worker['task'], None
+        if task is not None:
+            room_id, ordinal, message, attempts = task
+            if attempts < self.max_retries:
+                # retry first, so the room's order is kept
+                self.pending.setdefault(room_id, deque()).appendleft((room_id, ordinal, message, attempts + 1))
+                self.pending.move_to_end(room_id, last=False)
+            else:
+                failed.append((room_id, ordinal))
+            self.busy_rooms.discard(room_id)
+        return failed
+
+    def close(self):
+        self.running = False
+        with self.lock:
+            for worker in self.workers.values():
+                worker['tasks'].put(None)
+        for worker in self.workers.values():
+            worker['process'].join(timeout=5)
@@ -0,0 +1,49 @@
+from src import answer_cache
+from src.answer_cache import TTLCache, normalize_message
+
+class Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, 'time', clock.time)
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.put('a', 1)
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 1
+    assert cache.get('a', None) is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'expired': 1, 'hit_rate': 0.5, 'size': 0, 'invalidations': 0}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b', None) is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['size'] == 2
+
+def test_get_or_compute_computes_once():
+    cache = TTLCache()
+    calls = list()
+    def compute():
+        calls.append(1)
+        return 'answer'
+    assert cache.get_or_compute('q', compute) == 'answer'
+    assert cache.get_or_compute('q', compute) == 'answer'
+    assert len(calls) == 1
+
+def test_value_computed_during_invalidate_is_not_stored():
+    cache = TTLCache()
+    assert cache.get_or_compute('q', lambda: cache.invalidate() or 'old') == 'old'
+    assert cache.get('q', None) is None
+    assert cache.stats()['invalidations'] == 1
+
+def test_normalize_message():
+    assert normalize_message("  Who directed   Titanic? ") == "Who directed Titanic"
@@ -0,0 +1,39 @@
+import os
+import threading
+import numpy as np
+from src.indexing.array_store import StringTable, is_store_valid, save_arrays, load_arrays
+
+def test_rebuild_does_not_touch_mapped_arrays(tmp_path):
+    directory, source = str(tmp_path / 'store'), str(tmp_path / 'source.txt')
+    open(source, 'w').write('v1')
+    save_arrays(directory, {'values': np.arange(1000)}, 1, [source])
+    _, old = load_arrays(directory, ('values',))
+    open(source, 'w').write('version 2')
+    assert not is_store_valid(directory, 1, [source])
+    save_arrays(directory, {'values': np.arange(1000) * 2}, 1, [source])
+    assert is_store_valid(directory, 1, [source])
+    # the reader's memory map still sees the complete old arrays
+    assert old['values'].sum() == np.arange(1000).sum()
+    meta, new = load_arrays(directory, ('values', 'missing'))
+    assert new['values'][-1] == 1998 and new['missing'] is None
+    assert sorted(os.listdir(directory)) == sorted(['meta.json', meta['data']])
+
+def test_concurrent_rebuilds_leave_one_complete_store(tmp_path):
+    directory = str(tmp_path / 'store')
+    def rebuild(value):
+        save_arrays(directory, {'a': np.full(10000, value), 'b': np.full(10, value)}, 1, [], value=value)
+    threads = [threading.Thread(target=rebuild, args=(value,)) for value in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    meta, arrays = load_arrays(directory, ('a', 'b'))
+    assert (arrays['a'] == meta['value']).all() and (arrays['b'] == meta['value']).all()
+
+def test_string_table_round_trip(tmp_path):
+    table = StringTable.from_strings(['b', 'a', 'é', 'c'])
+    save_arrays(str(tmp_path), table.arrays('name'), 1, [])
+    _, arrays = load_arrays(str(tmp_path), StringTable.array_names('name'))
+    table = StringTable.from_arrays(arrays, 'name')
+    assert [table.get(value) for value in ['a', 'b', 'c', 'é', 'z']] == [1, 0, 3, 2, None]
+    assert table[2] == 'é'
@@ -0,0 +1,38 @@
+from src import answer_engine
+from src.answer_engine import AnswerEngine, reload_if_changed, data_signatures
+
+def make_engine(tmp_path, monkeypatch):
+    path = tmp_path / 'graph.nt'
+    path.write_text('v1')
+    monkeypatch.setattr(answer_engine, 'data_files', lambda data_config: [str(path)])
+    engine = object.__new__(AnswerEngine)
+    engine.name, engine.data_config = 'bot', None
+    engine.signatures = data_signatures(None)
+    engine.closed = False
+    monkeypatch.setattr(AnswerEngine, 'close', lambda self: setattr(self, 'closed', True))
+    return engine, path
+
+def test_engine_is_kept_while_its_files_are_unchanged(tmp_path, monkeypatch):
+    engine, _ = make_engine(tmp_path, monkeypatch)
+    assert reload_if_changed(engine) is engine
+
+def test_changed_file_loads_a_new_engine(tmp_path, monkeypatch):
+    engine, path = make_engine(tmp_path, monkeypatch)
+    def setup(self):
+        self.data_config = None
+        self.signatures = data_signatures(None)
+    monkeypatch.setattr(AnswerEngine, 'setup', setup)
+    path.write_text('version 2')
+    new_engine = reload_if_changed(engine)
+    assert new_engine is not engine and engine.closed
+    assert reload_if_changed(new_engine) is new_engine
+
+def test_failed_reload_keeps_the_old_engine(tmp_path, monkeypatch):
+    engine, path = make_engine(tmp_path, monkeypatch)
+    def setup(self):
+        raise OSError('truncated pickle')
+    monkeypatch.setattr(AnswerEngine, 'setup', setup)
+    path.write_text('version 2')
+    assert reload_if_changed(engine) is engine and not engine.closed
+    # tried again only once the files change again
+    assert not engine.is_stale()
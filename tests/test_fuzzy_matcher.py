@@ -0,0 +1,23 @@
+import random
+from src.indexing.fuzzy_matcher import FuzzyMatcher
+from src.nlp_utils import best_match
+
+def random_text(rng, length):
+    return ''.join(rng.choice('abcde: 12-') for _ in range(length))
+
+def test_best_match_agrees_with_linear_scan():
+    rng = random.Random(0)
+    labels = [random_text(rng, rng.randint(1, 15)) for _ in range(300)] + [None, 'abc', 'abc']
+    rng.shuffle(labels)
+    matcher = FuzzyMatcher(labels)
+    patterns = [random_text(rng, rng.randint(1, 30)) for _ in range(300)] + ['', 'zzz', 'a']
+    for pattern in patterns:
+        assert matcher.best_match(pattern) == best_match(pattern, labels), pattern
+
+def test_best_match_on_titles():
+    titles = ['Star Wars: Episode IV', 'Star Trek', '2001: A Space Odyssey', 'Se7en', 'Ocean\'s 11', 'Apollo 13']
+    matcher = FuzzyMatcher(titles)
+    for question in ['Who directed Star Wars: Episode IV?', 'When was 2001: A Space Odyssey released',
+                     'Who is in Ocean\'s 11', 'Apollo 13!', 'nothing here', 'x']:
+        assert matcher.best_match(question) == best_match(question, titles), question
+    assert matcher.best_match('zzz') is None
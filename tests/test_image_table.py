@@ -0,0 +1,61 @@
+import json
+import random
+import pytest
+from src.indexing.image_table import ImageTable, load_image_table
+from src.indexing.image_index import ImageIndex
+
+TYPES = ['poster', 'still_frame', 'behind_the_scenes']
+
+def random_images(rng, n=300):
+    people = [f'nm{i:07d}' for i in range(12)]
+    movies = [f'tt{i:07d}' for i in range(6)]
+    return [{
+        'img': f'{rng.randint(0, 999):04d}/rm{idx}é.jpg',
+        'type': rng.choice(TYPES),
+        'cast': rng.sample(people, rng.randint(0, 3)),
+        'movie': rng.sample(movies, rng.randint(0, 2))
+    } for idx in range(n)]
+
+@pytest.fixture
+def images(tmp_path):
+    data = random_images(random.Random(0))
+    path = tmp_path / 'images.json'
+    path.write_text(json.dumps(data, indent=1), encoding='utf-8')
+    return data, str(path)
+
+def scan(data, keep, img_type=None):
+    return [elem['img'] for elem in data if keep(elem) and (img_type is None or elem['type'] == img_type)]
+
+def check_lookups(table, data):
+    ids = {imdb_id for elem in data for imdb_id in elem['cast'] + elem['movie']} | {'nm9999999'}
+    for imdb_id in sorted(ids):
+        for img_type in [None] + TYPES + ['unknown']:
+            def rows(found):
+                return [table.img(row) for row in (found if img_type is None else table.of_type(found, img_type))]
+            assert rows(table.cast_rows(imdb_id)) == scan(data, lambda elem: imdb_id in elem['cast'], img_type)
+            assert rows(table.movie_rows(imdb_id)) == scan(data, lambda elem: imdb_id in elem['movie'], img_type)
+    casts = {tuple(elem['cast']) for elem in data if elem['cast']} | {('nm0000001', 'nm9999999')}
+    for cast in casts:
+        assert [table.img(row) for row in table.exact_cast_rows(cast)] == scan(data, lambda elem: elem['cast'] == list(cast))
+    # the image table has cast-less images, but an entity without IDs gets none of them
+    assert any(not elem['cast'] for elem in data)
+    assert len(table.exact_cast_rows(())) == 0
+
+def test_lookups_match_a_scan_of_the_json(images):
+    data, path = images
+    check_lookups(ImageTable.from_json(path), data)
+
+def test_saved_table_matches_a_scan_of_the_json(images, tmp_path):
+    data, path = images
+    directory = str(tmp_path / 'table')
+    load_image_table(directory, path)
+    table = load_image_table(directory, path)
+    assert type(table.type_codes).__name__ == 'memmap'
+    check_lookups(table, data)
+
+def test_entity_without_imdb_id_has_no_images(images):
+    data, path = images
+    cast = next(elem['cast'] for elem in data if len(elem['cast']) == 1)
+    index = ImageIndex(ImageTable.from_json(path), {'Q1': cast})
+    assert index.solo_images('Q1') == scan(data, lambda elem: elem['cast'] == cast)
+    assert index.solo_images('Q2') == [] and index.cast_images('Q2') == []
@@ -0,0 +1,50 @@
+import numpy as np
+from src.indexing.embedding_index import EmbeddingIndex
+from src.indexing.link_prediction import LinkPredictor
+
+class CountingIndex():
+    """EmbeddingIndex that records the queries it is asked."""
+    def __init__(self, matrix):
+        self.index = EmbeddingIndex(matrix)
+        self.calls = list()
+
+    def search(self, queries, k=1, partition=None):
+        self.calls.append((len(queries), partition))
+        return self.index.search(queries, k)
+
+def predictor(cache_size=4):
+    rng = np.random.default_rng(0)
+    entity_emb = rng.standard_normal((50, 8)).astype(np.float32)
+    relation_emb = rng.standard_normal((5, 8)).astype(np.float32)
+    return LinkPredictor(entity_emb, relation_emb, CountingIndex(entity_emb), {1: 'person'}, cache_size=cache_size)
+
+def expected(predictor, head, relation, k):
+    query = predictor.entity_emb[head] + predictor.relation_emb[relation]
+    distances = np.linalg.norm(predictor.entity_emb.astype(np.float64) - query, axis=1)
+    return tuple(int(idx) for idx in np.argsort(distances, kind='stable')[:k])
+
+def test_predictions_are_batched_and_cached():
+    link_predictor = predictor()
+    pairs = [(0, 0), (1, 1), (0, 0), (2, 0)]
+    results = link_predictor.predict(pairs, k=3)
+    assert results == [expected(link_predictor, head, relation, 3) for head, relation in pairs]
+    # one search per range type, the repeated pair is only scored once
+    assert link_predictor.entity_index.calls == [(2, None), (1, 'person')]
+    assert link_predictor.predict_one(2, 0, 3) == results[3]
+    assert link_predictor.entity_index.calls == [(2, None), (1, 'person')]
+    # a different k is a different cache entry
+    assert link_predictor.predict_one(2, 0, 1) == results[3][:1]
+    assert link_predictor.stats() == {'hits': 1, 'misses': 5, 'hit_rate': 1 / 6, 'size': 4}
+
+def test_least_recently_used_prediction_is_evicted():
+    link_predictor = predictor(cache_size=2)
+    link_predictor.predict_one(0, 0)
+    link_predictor.predict_one(1, 0)
+    link_predictor.predict_one(0, 0)
+    link_predictor.predict_one(2, 0)
+    assert list(link_predictor.cache) == [(0, 0, 1), (2, 0, 1)]
+    n_calls = len(link_predictor.entity_index.calls)
+    link_predictor.predict_one(1, 0)
+    assert len(link_predictor.entity_index.calls) == n_calls + 1
+    link_predictor.clear()
+    assert link_predictor.stats()['size'] == 0
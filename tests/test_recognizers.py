@@ -0,0 +1,71 @@
+from src.recognizers import Recognition, RecognizerCascade, StubRecognizer
+from src.indexing.label_index import LabelIndex
+from src.nlp_utils import EntityRecognition
+
+class Token():
+    def __init__(self, text, pos_):
+        self.text = text
+        self.pos_ = pos_
+
+def doc_of(sentence, proper_nouns):
+    return [Token(word, 'PROPN' if word in proper_nouns else 'NOUN') for word in sentence.split()]
+
+SENTENCE = "Who directed Titanic with Kate Winslet"
+DOC = doc_of(SENTENCE, {'Titanic', 'Kate', 'Winslet'})
+
+def cascade(linker_answer, transformer_answer, min_coverage=1.0):
+    return RecognizerCascade([
+        (StubRecognizer('special', {}, exact=True), None),
+        (StubRecognizer('linker', {SENTENCE: linker_answer}), None),
+        (StubRecognizer('transformer', {SENTENCE: transformer_answer}), min_coverage)
+    ])
+
+def test_expensive_stage_is_skipped_when_all_proper_nouns_are_resolved():
+    stages = cascade(Recognition(movies=['Q44578'], people=['Q202765'], spans=['Titanic', 'Kate Winslet']), Recognition(movies=['Q1']))
+    results = stages.run(SENTENCE, DOC)
+    assert list(results) == ['special', 'linker']
+    assert results['linker'].movies == ['Q44578']
+    assert stages.stats()['transformer'] == {'runs': 0, 'skipped': 1, 'hits': 0, 'hit_rate': 0.0, 'skip_rate': 1.0}
+
+def test_expensive_stage_runs_while_a_proper_noun_is_unresolved():
+    stages = cascade(Recognition(movies=['Q44578'], spans=['Titanic']), Recognition(people=['Q202765'], spans=['Kate Winslet']))
+    results = stages.run(SENTENCE, DOC)
+    assert list(results) == ['special', 'linker', 'transformer']
+    assert results['transformer'].people == ['Q202765']
+    # a lower threshold is already met by 1 of the 3 proper nouns
+    assert list(cascade(Recognition(movies=['Q44578'], spans=['Titanic']), Recognition(), min_coverage=0.3).run(SENTENCE, DOC)) == ['special', 'linker']
+
+def test_coverage_compares_whole_words():
+    stages = cascade(Recognition(), Recognition())
+    assert stages.coverage(['Ann'], ['Joanna']) == 0.0
+    assert stages.coverage(['Ann', 'Lee'], ['ann lee']) == 1.0
+    assert stages.coverage(['Spider-Man'], ['The Amazing Spider-Man']) == 1.0
+    assert stages.coverage([], []) == 1.0
+
+def test_stats_count_runs_skips_and_hits():
+    stages = cascade(Recognition(movies=['Q44578'], spans=['Titanic']), Recognition())
+    stages.run(SENTENCE, DOC)
+    stages.run("Hello there", doc_of("Hello there", set()))
+    stats = stages.stats()
+    assert stats['special'] == {'runs': 2, 'skipped': 0, 'hits': 0, 'hit_rate': 0.0, 'skip_rate': 0.0}
+    assert stats['linker'] == {'runs': 2, 'skipped': 0, 'hits': 1, 'hit_rate': 0.5, 'skip_rate': 0.0}
+    assert stats['transformer'] == {'runs': 1, 'skipped': 1, 'hits': 0, 'hit_rate': 0.0, 'skip_rate': 0.5}
+
+def test_stage_results_are_merged():
+    movies = {'Q44578': 'Titanic', 'Q1': 'Titan A.E.', 'Q2': 'Heat'}
+    people = {'Q202765': 'Kate Winslet'}
+    recognition = object.__new__(EntityRecognition)
+    recognition.movie_index, recognition.people_index = LabelIndex(movies), LabelIndex(people)
+    recognition.all_movies_dict, recognition.all_people_dict = movies, people
+    recognition.recognizers = {
+        'special': StubRecognizer('special', {SENTENCE: Recognition(movies=['Q2'], spans=['Heat'])}, exact=True),
+        'linker': StubRecognizer('linker', {SENTENCE: Recognition(movies=['Q1'], people=['Q202765'], spans=['Titan', 'Kate Winslet'])}),
+        'transformer': StubRecognizer('transformer', {SENTENCE: Recognition(movies=['Q44578'], spans=['Titanic'])})
+    }
+    recognition.cascade = RecognizerCascade([(recognition.recognizers[name], None) for name in ('special', 'linker', 'transformer')])
+    movies_found, people_found, misc_found = recognition.find_entities(SENTENCE, DOC)
+    # the linker and the transformer tie on one movie each: the label closest to the
+    # sentence wins, and the exact stage's movies are always added
+    assert movies_found == ['Q44578', 'Q2']
+    assert people_found == ['Q202765']
+    assert misc_found is None
@@ -0,0 +1,32 @@
+from src.room_polling import RoomSchedule
+
+def welcome(ordinal=0):
+    return {'ordinal': ordinal, 'message': "Welcome!", 'authorAlias': 'bot'}
+
+def test_idle_room_with_only_the_welcome_message_backs_off():
+    schedule = RoomSchedule(min_interval=0.5, max_interval=8.0, backoff_factor=2.0)
+    intervals = list()
+    for now in range(8):
+        # the server keeps returning the welcome message, since it is at the cursor
+        schedule.update('room', [welcome()], float(now))
+        intervals.append(schedule.rooms['room']['interval'])
+    assert intervals == [0.5, 1.0, 2.0, 4.0, 8.0, 8.0, 8.0, 8.0]
+    assert schedule.since('room') == 0
+
+def test_new_message_resets_the_interval():
+    schedule = RoomSchedule(min_interval=0.5, max_interval=8.0, backoff_factor=2.0)
+    schedule.update('room', [welcome()], 0.0)
+    schedule.update('room', [welcome()], 1.0)
+    schedule.update('room', [welcome(), {'ordinal': 1, 'message': "Hi", 'authorAlias': 'user'}], 2.0)
+    assert schedule.rooms['room']['interval'] == 0.5
+    assert schedule.since('room') == 1
+
+def test_first_message_after_empty_polls_is_new():
+    schedule = RoomSchedule(min_interval=0.5, max_interval=8.0, backoff_factor=2.0)
+    assert schedule.since('room') == 0
+    schedule.update('room', [], 0.0)
+    schedule.update('room', [], 1.0)
+    assert schedule.rooms['room']['interval'] == 2.0
+    schedule.update('room', [welcome()], 2.0)
+    assert schedule.rooms['room']['interval'] == 0.5
+    assert schedule.rooms['room']['next_poll'] == 2.5
@@ -0,0 +1,67 @@
+import rdflib
+import pytest
+from src.indexing.triple_store import TripleStore, RdflibStore, literal_key, snapshot_path, is_snapshot_valid
+
+WD = 'http://www.wikidata.org/entity/'
+WDT = 'http://www.wikidata.org/prop/direct/'
+LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+DESCRIPTION = 'http://schema.org/description'
+XSD_DATE = 'http://www.w3.org/2001/XMLSchema#date'
+
+GRAPH = f'''# a comment
+<{WD}Q1> <{WDT}P57> <{WD}Q2> .
+<{WD}Q1> <{WDT}P57> <{WD}Q3> .
+<{WD}Q4> <{WDT}P57> <{WD}Q2> .
+<{WD}Q1> <{LABEL}> "The \\"Film\\" \\u00e9\\ttab"@en .
+<{WD}Q2> <{LABEL}> "Bob"@en .
+<{WD}Q2> <{DESCRIPTION}> "a man\\nwith a newline"@en .
+<{WD}Q3> <{LABEL}> "Ann" .
+<{WD}Q1> <{WDT}P577> "1999-01-01"^^<{XSD_DATE}> .
+<{WD}Q4> <{WDT}P577> "1999-01-01"^^<{XSD_DATE}> .
+<{WD}Q4> <{WDT}P2142> "5.5E7"^^<http://www.w3.org/2001/XMLSchema#decimal> .
+'''
+
+QUERIES = [
+    ('objects', (WD + 'Q1', WDT + 'P57')),
+    ('objects', (WD + 'Q1', WDT + 'P577')),
+    ('objects', (WD + 'Q4', WDT + 'P2142')),
+    ('objects', (WD + 'Q9', WDT + 'P57')),
+    ('subjects', (WDT + 'P57', WD + 'Q2')),
+    ('subjects', (WDT + 'P577', literal_key('1999-01-01', datatype=XSD_DATE))),
+    ('subjects', (LABEL, literal_key('Bob', lang='en'))),
+    ('subjects', (LABEL, literal_key('Ann'))),
+    ('label', (WD + 'Q1',)),
+    ('label', (WD + 'Q3',)),
+    ('label', (WD + 'Q9',)),
+    ('subject_objects', (DESCRIPTION,)),
+    ('subject_objects', (WDT + 'P57',)),
+    ('subject_objects', (WDT + 'P9999',)),
+]
+
+def answer(store, method, args):
+    result = getattr(store, method)(*args)
+    return result if method == 'label' else sorted(result)
+
+@pytest.fixture
+def graph_path(tmp_path):
+    path = tmp_path / 'graph.nt'
+    path.write_text(GRAPH, encoding='utf-8')
+    return str(path)
+
+def test_matches_rdflib(graph_path):
+    reference = RdflibStore(rdflib.Graph().parse(graph_path, format='nt'))
+    for store in (TripleStore.from_ntriples(graph_path), TripleStore.from_graph(reference.graph)):
+        assert len(store) == len(reference)
+        for method, args in QUERIES:
+            assert answer(store, method, args) == answer(reference, method, args), (method, args)
+    assert reference.label(WD + 'Q1') == 'The "Film" é\ttab'
+
+def test_snapshot_round_trip(graph_path):
+    store = TripleStore.from_ntriples(graph_path)
+    directory = snapshot_path(graph_path)
+    assert not is_snapshot_valid(directory, graph_path)
+    store.save(directory, graph_path)
+    assert is_snapshot_valid(directory, graph_path)
+    loaded = TripleStore.load(directory)
+    for method, args in QUERIES:
+        assert answer(loaded, method, args) == answer(store, method, args), (method, args)
@@ -0,0 +1,34 @@
+import os
+import rdflib
+from src.global_variables import WD, WDT
+from src.indexing.type_index import TypeIndex, load_type_index, type_index_path
+
+def write_graph(path, triples):
+    graph = rdflib.Graph()
+    for subj, cls in triples:
+        graph.add((WD[subj], WDT['P31'], WD[cls]))
+    graph.serialize(path, format='nt', encoding='utf-8')
+    return graph
+
+def test_each_graph_file_has_its_own_index(tmp_path):
+    index_path = str(tmp_path / 'entity_types.pickle')
+    raw_path, updated_path = str(tmp_path / '14_graph.nt'), str(tmp_path / 'updated_graph.nt')
+    raw_graph = write_graph(raw_path, [('Q1', 'Q11424')])
+    updated_graph = write_graph(updated_path, [('Q1', 'Q5')])
+    assert load_type_index(index_path, raw_path, raw_graph).is_film('Q1')
+    # the index of the raw graph is not picked up for the updated one
+    assert load_type_index(index_path, updated_path, updated_graph).is_person('Q1')
+    assert load_type_index(index_path, raw_path).is_film('Q1')
+    assert type_index_path(index_path, updated_path) == str(tmp_path / 'entity_types.updated_graph.pickle')
+
+def test_index_of_another_or_changed_graph_is_not_loaded(tmp_path):
+    index_path = str(tmp_path / 'entity_types.pickle')
+    graph_path, other_path = str(tmp_path / 'a.nt'), str(tmp_path / 'b.nt')
+    graph = write_graph(graph_path, [('Q1', 'Q11424')])
+    write_graph(other_path, [('Q2', 'Q11424')])
+    TypeIndex.from_graph(graph).save(index_path, graph_path)
+    assert TypeIndex.load(index_path, graph_path).is_film('Q1')
+    assert TypeIndex.load(index_path, other_path) is None
+    write_graph(graph_path, [('Q1', 'Q11424'), ('Q2', 'Q5')])
+    os.utime(graph_path, ns=(0, 0))
+    assert TypeIndex.load(index_path, graph_path) is None
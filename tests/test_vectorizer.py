@@ -0,0 +1,29 @@
+import random
+import numpy as np
+from src.training.vectorizer import BagOfWordsVectorizer
+
+def bag_of_words(vocabulary, sentence):
+    # the implementation BagOfWordsVectorizer replaced
+    bag = np.zeros(len(vocabulary), dtype=np.float32)
+    for word in vocabulary:
+        if word in sentence:
+            idx = vocabulary.index(word)
+            bag[idx] += 1
+    return bag
+
+def test_transform_matches_bag_of_words():
+    rng = random.Random(0)
+    words = ['who', 'direct', 'movie', 'recommend', 'show', 'picture', 'be', 'the', 'of', 'release']
+    # duplicated vocabulary entries count once per occurrence, at the first position
+    vocabulary = words + ['movie', 'the', 'movie']
+    vectorizer = BagOfWordsVectorizer(vocabulary)
+    restored = BagOfWordsVectorizer.from_state_dict(vectorizer.state_dict())
+    for _ in range(200):
+        sentence = [rng.choice(words + ['unknown', 'Movie']) for _ in range(rng.randint(0, 8))]
+        expected = bag_of_words(vocabulary, sentence)
+        assert np.array_equal(vectorizer.transform(sentence), expected), sentence
+        assert np.array_equal(restored.transform(sentence), expected), sentence
+
+def test_empty_sentence_and_vocabulary():
+    assert not BagOfWordsVectorizer(['a', 'b']).transform([]).any()
+    assert BagOfWordsVectorizer([]).transform(['a']).shape == (0,)